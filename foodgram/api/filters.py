@@ -1,39 +1,115 @@
-from django_filters import (ModelMultipleChoiceFilter, NumberFilter,
+from django.db.models import Case, Count, IntegerField, Value, When
+from django_filters import (CharFilter, ChoiceFilter,
+                            ModelMultipleChoiceFilter, NumberFilter,
                             rest_framework)
-from food.models import Ingredients, Recipe, Tag
+from food.models import Favorite, Ingredients, Recipe, ShoppingCart, Tag
+from food.search import search_recipes
 from rest_framework.filters import SearchFilter
 
 
 class IngredientFilter(SearchFilter):
+    """
+    Поиск ингредиентов в базе, когда индекс в памяти отключен:
+    точное совпадение, затем по началу названия, затем по подстроке.
+    """
     search_param = 'name'
 
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name:
+            return queryset
+        return queryset.filter(name__icontains=name).annotate(
+            rank=Case(
+                When(name__iexact=name, then=Value(0)),
+                When(name__istartswith=name, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField(),
+            )
+        ).order_by('rank', 'name')
+
     class Meta:
         model = Ingredients
         fields = ('name',)
 
 
 class MyFilterSet(rest_framework.FilterSet):
+    """
+    Теги и флаги пользователя фильтруются подзапросами id__in,
+    поэтому рецепты не дублируются при совпадении нескольких тегов.
+    """
+    TAGS_ANY = 'any'
+    TAGS_ALL = 'all'
+    ORDERINGS = {
+        'new': ('-pub_date', '-id'),
+        'popular': ('-popularity', '-id'),
+    }
+    DEFAULT_ORDERING = 'new'
+
     author = rest_framework.NumberFilter(
         field_name='author__id'
     )
     tags = ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        method='filter_tags'
+    )
+    tags_mode = ChoiceFilter(
+        choices=((TAGS_ANY, 'Любой из тегов'), (TAGS_ALL, 'Все теги')),
+        method='filter_tags_mode'
     )
     is_favorited = NumberFilter(
         method='filter_is_favorited')
     is_in_shopping_cart = NumberFilter(
         method='filter_shopping_cart')
+    search = CharFilter(
+        method='filter_search')
+    ordering = ChoiceFilter(
+        choices=(('new', 'Сначала новые'), ('popular', 'Сначала популярные')),
+        method='filter_ordering'
+    )
+
+    def filter_tags(self, qs, name, value):
+        tag_ids = {tag.id for tag in value}
+        if not tag_ids:
+            return qs
+        links = Recipe.tags.through.objects.filter(tag__in=tag_ids)
+        if self.form.cleaned_data.get('tags_mode') == self.TAGS_ALL:
+            links = links.values('recipe').annotate(
+                matched=Count('tag')).filter(matched=len(tag_ids))
+        return qs.filter(id__in=links.values('recipe'))
+
+    def filter_tags_mode(self, qs, name, value):
+        return qs
+
+    @classmethod
+    def get_ordering(cls, value):
+        return cls.ORDERINGS.get(value, cls.ORDERINGS[cls.DEFAULT_ORDERING])
+
+    def filter_search(self, qs, name, value):
+        """Поиск сортирует по рангу, пока не задан ordering."""
+        value = value.strip()
+        return search_recipes(qs, value) if value else qs
+
+    def filter_ordering(self, qs, name, value):
+        return qs.order_by(*self.get_ordering(value))
 
     def filter_shopping_cart(self, qs, name, value):
-        if value == 1:
-            return qs.filter(shopping_list__user=self.request.user)
+        return self.filter_user_recipes(qs, value, ShoppingCart)
 
     def filter_is_favorited(self, qs, name, value):
-        if value == 1:
-            return qs.filter(favorites__user=self.request.user)
+        return self.filter_user_recipes(qs, value, Favorite)
+
+    def filter_user_recipes(self, qs, value, model):
+        if value != 1:
+            return qs
+        user = self.request.user
+        if user.is_anonymous:
+            return qs.none()
+        return qs.filter(
+            id__in=model.objects.filter(user=user).values('recipe'))
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+        fields = ['author', 'tags', 'tags_mode', 'is_favorited',
+                  'is_in_shopping_cart', 'search', 'ordering']
@@ -1,4 +1,14 @@
+import time
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from food.cache import get_versions
 from rest_framework import mixins, viewsets
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 
 
 class CreateListDestroyViewSet(
@@ -8,3 +18,104 @@ class CreateListDestroyViewSet(
     viewsets.GenericViewSet
 ):
     pass
+
+
+def cache_response(request, namespaces, path, build, *args, **kwargs):
+    """
+    Сериализованный ответ кэшируется под версиями namespaces. ETag -
+    хэш самого ответа, Last-Modified - время его сборки: если версию
+    не сбросили, после истечения кэша клиент все равно получит новые
+    данные, а не 304.
+    """
+    versions = get_versions(namespaces)
+    digest = md5('|'.join((
+        *namespaces, *map(str, versions), request.accepted_renderer.format,
+        request.get_host(), path,
+    )).encode()).hexdigest()
+    key = f'response:{digest}'
+    cached = cache.get(key)
+    if cached is None:
+        response = build(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        data = response.data
+        body = md5(JSONRenderer().render(data)).hexdigest()
+        cached = (data, body, int(time.time()))
+        cache.set(key, cached)
+    data, body, last_modified = cached
+    etag = quote_etag(body)
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+    response = Response(data)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class CachedReferenceMixin:
+    """
+    Кэширует сериализованные ответы справочников под версией
+    cache_namespace и отвечает 304 по ETag и Last-Modified.
+    """
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cache_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cache_response(
+            request, super().retrieve, *args, **kwargs)
+
+    def cache_response(self, request, build, *args, **kwargs):
+        return cache_response(
+            request, (self.cache_namespace,), request.get_full_path(),
+            build, *args, **kwargs)
+
+
+class AnonymousCacheMixin:
+    """
+    Кэширует ответы анонимным пользователям. Версии, от которых
+    зависит ответ, возвращает get_cache_namespaces, None - ответ не
+    кэшируется. Запросы с параметрами вне cache_query_params тоже не
+    кэшируются.
+    """
+    cache_query_params = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cache_anonymous(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cache_anonymous(
+            request, super().retrieve, *args, **kwargs)
+
+    def get_cache_namespaces(self, params):
+        raise NotImplementedError
+
+    def normalize_query(self, request):
+        """
+        Параметры без пустых значений и повторов в одном порядке:
+        ?tags=a&tags=b и ?tags=b&tags=a&page= дают один ключ.
+        """
+        params = {}
+        for name, values in request.query_params.lists():
+            values = sorted({value for value in values if value})
+            if not values:
+                continue
+            if name not in self.cache_query_params:
+                return None
+            params[name] = values
+        return dict(sorted(params.items()))
+
+    def cache_anonymous(self, request, build, *args, **kwargs):
+        params = self.normalize_query(request)
+        namespaces = None
+        if request.user.is_anonymous and params is not None:
+            namespaces = self.get_cache_namespaces(params)
+        if namespaces is None:
+            return build(request, *args, **kwargs)
+        path = f'{request.path}?{urlencode(params, doseq=True)}'
+        return cache_response(
+            request, namespaces, path, build, *args, **kwargs)
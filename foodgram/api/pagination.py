@@ -1,6 +1,227 @@
-from rest_framework.pagination import PageNumberPagination
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from food.feed import from_position, position
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу из полей ordering, последнее из них - id.
+    Следующая страница выбирается условием (a, id) < (a0, id0), без
+    OFFSET, поэтому повторы значений a не ломают обход.
+    """
+    page_size = 10
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+    ordering = ('-pub_date', '-id')
+    forward = 'n'
+    backward = 'p'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = min(get_limit(request) or self.page_size, self.max_page_size)
+        direction, values = self.decode_cursor(request, queryset.model)
+        ordering = self.ordering
+        if direction == self.backward:
+            ordering = [self.reverse(field) for field in ordering]
+        if values is not None:
+            queryset = queryset.filter(self.after(ordering, values))
+        rows = list(queryset.order_by(*ordering)[:size + 1])
+        more, rows = len(rows) > size, rows[:size]
+        if direction == self.backward:
+            rows.reverse()
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, values is not None
+        self.next_cursor = (
+            self.encode_cursor(self.forward, rows[-1])
+            if has_next and rows else None
+        )
+        self.previous_cursor = (
+            self.encode_cursor(self.backward, rows[0])
+            if has_previous and rows else None
+        )
+        return rows
+
+    @staticmethod
+    def reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, values):
+        """Строки после ключа values в порядке ordering."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def encode_cursor(self, direction, row):
+        values = [getattr(row, field.lstrip('-')) for field in self.ordering]
+        payload = json.dumps([direction, *(
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        )])
+        cursor = urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return self.forward, None
+        try:
+            direction, *values = json.loads(urlsafe_b64decode(
+                cursor.encode()).decode())
+            if (direction not in (self.forward, self.backward)
+                    or len(values) != len(self.ordering)):
+                raise ValueError
+            return direction, [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_cursor,
+            'previous': self.previous_cursor,
+            'results': data,
+        })
+
+
+class FeedPagination(CustomPagination):
+    """
+    Постраничная пагинация, а с параметром pagination=cursor - по курсору.
+    Порядок курсора берется из cursor_ordering представления.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+
+    def __init__(self):
+        self.keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.mode_query_param) != self.cursor_mode:
+            self.keyset = None
+            return super().paginate_queryset(queryset, request, view)
+        self.keyset = KeysetPagination()
+        self.keyset.ordering = getattr(
+            view, 'cursor_ordering', KeysetPagination.ordering)
+        return self.keyset.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class TimelinePagination(BasePagination):
+    """
+    Пагинация ленты по ключу (pub_date, id). Страница берется из
+    готовой ленты в кэше, а за ее пределами - запросом по индексу.
+    """
+    page_size = 10
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate(self, request, queryset, timeline=None):
+        self.request = request
+        size = self.get_page_size(request)
+        after = self.decode_cursor(request)
+        if timeline is not None:
+            start = 0 if after is None else bisect_right(timeline, after)
+            window = timeline[start:start + size + 1]
+            if (len(window) > size
+                    or len(timeline) < settings.FEED_TIMELINE_SIZE):
+                return self.page_from_timeline(queryset, window, size)
+        if after is not None:
+            pub_date, pk = from_position(after)
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk))
+        recipes = list(queryset.order_by('-pub_date', '-id')[:size + 1])
+        self.next_position = (
+            position(recipes[size - 1].pub_date, recipes[size - 1].id)
+            if len(recipes) > size else None
+        )
+        return recipes[:size]
+
+    def page_from_timeline(self, queryset, window, size):
+        self.next_position = window[size - 1] if len(window) > size else None
+        recipes = queryset.in_bulk([-pk for _, pk in window[:size]])
+        return [
+            recipes[-pk] for _, pk in window[:size] if -pk in recipes
+        ]
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            microseconds, pk = urlsafe_b64decode(
+                cursor.encode()).decode().split(':')
+            return int(microseconds), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        cursor = urlsafe_b64encode(
+            '{}:{}'.format(*self.next_position).encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+def get_limit(request):
+    """Положительный limit из запроса или None."""
+    try:
+        limit = int(request.query_params['limit'])
+    except (KeyError, ValueError):
+        return None
+    return limit if limit > 0 else None
+
+
+def get_recipes_limit(request):
+    """Сколько рецептов автора показывать в подписках."""
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (AttributeError, KeyError, ValueError):
+        return settings.RECIPES_LIMIT
+    return min(max(limit, 0), settings.MAX_RECIPES_LIMIT)
@@ -0,0 +1,140 @@
+import csv
+import os
+import tempfile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import renderers
+from rest_framework.negotiation import DefaultContentNegotiation
+
+SHOPPING_LIST_TITLE = 'Купить в магазине:'
+
+
+def shopping_list_line(ingredient):
+    return (f"{ingredient['name']} "
+            f"({ingredient['measurement_unit']}) - "
+            f"{ingredient['amount']}")
+
+
+class FormatContentNegotiation(DefaultContentNegotiation):
+    """
+    Формат выбирается только параметром format,
+    без него отдается первый из рендереров.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format_query = format_suffix or request.query_params.get(
+            self.settings.URL_FORMAT_OVERRIDE)
+        if format_query:
+            renderers = self.filter_renderers(renderers, format_query)
+        return renderers[0], renderers[0].media_type
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    """
+    Список покупок отдается потоком через stream(),
+    render() нужен только для ответов с ошибками.
+    """
+    charset = 'utf-8'
+
+    def stream(self, ingredients):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        return b''.join(self.stream_lines([str(data)]))
+
+    def stream_lines(self, lines):
+        for line in lines:
+            yield f'{line}\n'.encode(self.charset)
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        yield SHOPPING_LIST_TITLE.encode(self.charset)
+        for ingredient in ingredients:
+            yield f'\n{shopping_list_line(ingredient)}'.encode(self.charset)
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Единица измерения', 'Количество')
+        ).encode(self.charset)
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['name'],
+                ingredient['measurement_unit'],
+                ingredient['amount'],
+            )).encode(self.charset)
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_size = 12
+    margin = 50
+    chunk_size = 64 * 1024
+    max_memory_size = 1024 * 1024
+
+    def stream(self, ingredients):
+        lines = (shopping_list_line(ingredient) for ingredient in ingredients)
+        return self.stream_lines(lines, title=SHOPPING_LIST_TITLE)
+
+    def stream_lines(self, lines, title=None):
+        """
+        reportlab собирает документ целиком, поэтому страницы пишутся
+        во временный файл, который при большом размере уходит на диск,
+        а клиенту отдается кусками.
+        """
+        font = self.get_font()
+        width, height = A4
+        with tempfile.SpooledTemporaryFile(self.max_memory_size) as buffer:
+            pdf = canvas.Canvas(buffer, pagesize=A4)
+            pdf.setTitle(title or '')
+            y = height - self.margin
+            if title:
+                pdf.setFont(font, self.font_size + 4)
+                pdf.drawString(self.margin, y, title)
+                y -= 2 * self.font_size
+            pdf.setFont(font, self.font_size)
+            for line in lines:
+                if y < self.margin:
+                    pdf.showPage()
+                    pdf.setFont(font, self.font_size)
+                    y = height - self.margin
+                pdf.drawString(self.margin, y, line)
+                y -= 1.5 * self.font_size
+            pdf.save()
+            buffer.seek(0)
+            yield from iter(lambda: buffer.read(self.chunk_size), b'')
+
+    @staticmethod
+    def get_font():
+        """Стандартные шрифты PDF не содержат кириллицы."""
+        path = settings.SHOPPING_LIST_PDF_FONT
+        if not os.path.exists(path):
+            return 'Helvetica'
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(name, path))
+        return name
@@ -1,13 +1,41 @@
+import binascii
+import uuid
+from base64 import b64decode
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.db.utils import IntegrityError
 from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
+from food.cache import INGREDIENTS, TAGS, get_versions
+from food.coverage_index import record_change
+from food.images import schedule_renditions
 from food.models import (Favorite, Ingredients, IngredientToRecipe, Recipe,
                          ShoppingCart, Tag, User)
+from food.search import highlight, update_search_vectors
+from food.shopping_list import refresh_recipe
+from food.units import AMOUNT_PLACES, AMOUNT_STEP
 from rest_framework import serializers
 from rest_framework.serializers import SerializerMethodField
 from users.models import Follow
 
+from .pagination import get_recipes_limit
+
+
+def get_followed_ids(request):
+    """Id авторов, на которых подписан пользователь, один раз на запрос."""
+    if request.user.is_anonymous:
+        return frozenset()
+    if not hasattr(request, 'followed_ids'):
+        request.followed_ids = frozenset(
+            request.user.follower.values_list('author_id', flat=True))
+    return request.followed_ids
+
 
 class UserRegistrationSerializer(UserCreateSerializer):
 
@@ -42,11 +70,10 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        user = self.context['request'].user
-        if user.is_anonymous:
+        request = self.context.get('request')
+        if request is None:
             return False
-        return user.follower.filter(author=obj).exists()
+        return obj.id in get_followed_ids(request)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -62,15 +89,17 @@ class IngredientsSerializer(serializers.ModelSerializer):
 
 
 class IngredientToRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        source='ingredient',
-        queryset=Ingredients.objects.all(),
-    )
+    id = serializers.IntegerField(source='ingredient_id')
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit'
     )
-    amount = serializers.FloatField()
+    amount = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=AMOUNT_PLACES,
+        min_value=AMOUNT_STEP,
+        coerce_to_string=False,
+    )
 
     class Meta:
         model = IngredientToRecipe
@@ -82,7 +111,58 @@ class IngredientToRecipeSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipeImageField(serializers.ReadOnlyField):
+    """
+    Ссылка на уменьшенную копию изображения, а пока ее нет - на оригинал.
+    """
+
+    def __init__(self, rendition=None, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+        self.rendition = rendition
+
+    def to_representation(self, recipe):
+        rendition = self.rendition or self.context.get('image_rendition')
+        image = (rendition and getattr(recipe, rendition)) or recipe.image
+        if not image:
+            return None
+        request = self.context.get('request')
+        if request is None:
+            return image.url
+        return request.build_absolute_uri(image.url)
+
+
+class DeferredImageField(Base64ImageField):
+    """
+    Картинка в base64 принимается без декодирования: формат проверяется
+    по первым байтам, остальное делает фоновая задача.
+    """
+    SIGNATURES = {
+        b'\xff\xd8\xff': 'jpg',
+        b'\x89PNG\r\n\x1a\n': 'png',
+        b'GIF87a': 'gif',
+        b'GIF89a': 'gif',
+    }
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(data, str):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        data = data.split(';base64,', 1)[-1].strip()
+        try:
+            head = b64decode(data[:16])
+        except (binascii.Error, ValueError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        for signature, extension in self.SIGNATURES.items():
+            if head.startswith(signature):
+                return ContentFile(
+                    data.encode(), name=f'{uuid.uuid4()}.{extension}')
+        raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+
+
 class ShortResipeSerializer(serializers.ModelSerializer):
+    image = RecipeImageField('image_thumbnail')
 
     class Meta:
         model = Recipe
@@ -98,7 +178,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         many=True,
         source='ingredienttorecipe_set'
     )
-    image = Base64ImageField(required=False)
+    image = DeferredImageField(required=False)
 
     class Meta:
         model = Recipe
@@ -107,11 +187,15 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'ingredients',
             'name',
             'image',
+            'image_status',
             'text',
             'cooking_time',
         )
+        read_only_fields = ('image_status',)
 
     def validate(self, data):
+        if self.partial and 'ingredients' not in self.initial_data:
+            return data
         ingredients = self.initial_data.get('ingredients')
         if not ingredients:
             raise serializers.ValidationError({
@@ -120,10 +204,42 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
         return data
 
+    def validate_ingredients(self, ingredients):
+        ids = [
+            ingredient_data.get('ingredient_id')
+            for ingredient_data in ingredients
+        ]
+        repeated = [pk for pk, count in Counter(ids).items() if count > 1]
+        if repeated:
+            raise serializers.ValidationError(
+                F'Ингредиенты {sorted(repeated)} указаны несколько раз'
+            )
+        ids = set(ids)
+        missing = ids - set(Ingredients.objects.filter(
+            id__in=ids).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                F'Ингредиентов {sorted(missing)} не существует'
+            )
+        return ingredients
+
+    def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            Prefetch(
+                'ingredienttorecipe_set',
+                queryset=IngredientToRecipe.objects.select_related(
+                    'ingredient')
+            ),
+        )
+        return super().to_representation(instance)
+
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request', None)
         ingredients = validated_data.pop('ingredienttorecipe_set')
-        tags_data = validated_data.pop('tags')
+        tags_data = validated_data.pop('tags', [])
+        image = validated_data.pop('image', None)
         try:
             recipe = Recipe.objects.create(
                 author=request.user,
@@ -133,39 +249,108 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 u'ingredients': 'Что-то прошло не так,'
                 u'проверьте веденные данные'
             })
-        recipe.tags.set(tags_data)
+        if tags_data:
+            recipe.tags.set(tags_data)
         self.create_ingredients(recipe, ingredients)
+        update_search_vectors((recipe.id,))
+        record_change(recipe.id)
+        if image:
+            schedule_renditions(recipe, image)
         return recipe
 
     @staticmethod
     def create_ingredients(recipe, ingredients):
-        for ingredient_data in ingredients:
-            ingredient_obj = ingredient_data.get('ingredient')
-            IngredientToRecipe.objects.create(
-                ingredient=ingredient_obj,
+        IngredientToRecipe.objects.bulk_create(
+            IngredientToRecipe(
+                ingredient_id=ingredient_data.get('ingredient_id'),
                 amount=ingredient_data.get('amount'),
                 recipe=recipe,
             )
+            for ingredient_data in ingredients
+        )
 
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        """Записываем в базу только изменившиеся ингредиенты."""
+        amounts = {
+            ingredient_data.get('ingredient_id'): ingredient_data.get('amount')
+            for ingredient_data in ingredients
+        }
+        to_delete = []
+        to_update = []
+        for row in IngredientToRecipe.objects.filter(recipe=recipe):
+            amount = amounts.pop(row.ingredient_id, None)
+            if amount is None:
+                to_delete.append(row.id)
+            elif row.amount != amount:
+                row.amount = amount
+                to_update.append(row)
+        if to_delete:
+            # Сигналов удаления у IngredientToRecipe нет: один DELETE.
+            IngredientToRecipe.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            IngredientToRecipe.objects.bulk_update(to_update, ('amount',))
+        if amounts:
+            IngredientToRecipe.objects.bulk_create(
+                IngredientToRecipe(
+                    ingredient_id=ingredient_id,
+                    amount=amount,
+                    recipe=recipe,
+                )
+                for ingredient_id, amount in amounts.items()
+            )
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        IngredientToRecipe.objects.filter(recipe=instance).delete()
-        instance.tags.set(validated_data.pop('tags'))
-        ingredients = validated_data.pop('ingredienttorecipe_set')
-        self.create_ingredients(instance, ingredients)
+        image = validated_data.pop('image', None)
+        if image:
+            schedule_renditions(instance, image)
+        tags_data = validated_data.pop('tags', None)
+        if tags_data is not None:
+            instance.tags.set(tags_data)
+        ingredients = validated_data.pop('ingredienttorecipe_set', None)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+            refresh_recipe(instance.id)
+            record_change(instance.id)
         return super().update(instance, validated_data)
 
 
+RECIPE_BODY_PREFETCH = (
+    'tags',
+    Prefetch(
+        'ingredienttorecipe_set',
+        queryset=IngredientToRecipe.objects.select_related('ingredient')
+    ),
+)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Тела рецептов страницы одним обращением к кэшу."""
+
+    def to_representation(self, data):
+        recipes = list(data.all() if hasattr(data, 'all') else data)
+        representations = self.child.get_representations(recipes)
+        return [representations[recipe.pk] for recipe in recipes]
+
+
 class RecipeReadSerializer(serializers.ModelSerializer):
+    """
+    Общая для всех пользователей часть рецепта кэшируется по
+    (id, updated_at), флаги пользователя подставляются поверх нее.
+    """
+    USER_FIELDS = ('is_favorited', 'is_in_shopping_cart', 'search_headline')
+
     tags = serializers.SerializerMethodField()
     ingredients = IngredientToRecipeSerializer(
         many=True,
         source='ingredienttorecipe_set'
     )
     author = CustomUserSerializer(read_only=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    search_headline = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -178,16 +363,72 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_status',
             'text',
             'cooking_time',
+            'search_headline',
         )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        return self.get_representations([instance])[instance.pk]
+
+    def get_body_key(self, recipe, versions):
+        request = self.context.get('request')
+        return 'recipe-body:{}:{}:{}:{}:{}'.format(
+            recipe.pk, recipe.updated_at.timestamp(), versions,
+            self.context.get('image_rendition'),
+            request.get_host() if request else '',
+        )
+
+    def get_representations(self, recipes):
+        """
+        Рецепты из кэша дополняются флагами пользователя, остальные
+        сериализуются целиком с подгрузкой тегов и ингредиентов.
+        """
+        versions = '-'.join(map(str, get_versions((TAGS, INGREDIENTS))))
+        keys = {
+            recipe.pk: self.get_body_key(recipe, versions)
+            for recipe in recipes
+        }
+        cached = cache.get_many(keys.values())
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in cached
+        ]
+        prefetch_related_objects(missing, *RECIPE_BODY_PREFETCH)
+        representations = {}
+        bodies = {}
+        for recipe in missing:
+            data = super().to_representation(recipe)
+            representations[recipe.pk] = data
+            body = dict(data, author=dict(data['author'], is_subscribed=None))
+            body.update(dict.fromkeys(self.USER_FIELDS))
+            bodies[keys[recipe.pk]] = body
+        if bodies:
+            cache.set_many(bodies, settings.RECIPE_FRAGMENT_TIMEOUT)
+        for recipe in recipes:
+            if recipe.pk not in representations:
+                representations[recipe.pk] = self.overlay(
+                    recipe, cached[keys[recipe.pk]])
+        return representations
+
+    def overlay(self, recipe, body):
+        data = dict(body, author=dict(
+            body['author'],
+            is_subscribed=self.fields['author'].get_is_subscribed(
+                recipe.author),
+        ))
+        data['is_favorited'] = self.get_is_favorited(recipe)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(recipe)
+        data['search_headline'] = self.get_search_headline(recipe)
+        return data
 
     def get_tags(self, obj):
-        return TagSerializer(
-            Tag.objects.filter(recipes=obj),
-            many=True,).data
+        return TagSerializer(obj.tags.all(), many=True).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request', None)
         if request:
             current_user = request.user
@@ -197,6 +438,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request', None)
         if request:
             current_user = request.user
@@ -205,6 +448,14 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             recipe=obj.id,
         ).exists()
 
+    def get_search_headline(self, obj):
+        """Фрагмент описания с совпадениями, только при поиске."""
+        if hasattr(obj, 'search_headline'):
+            return obj.search_headline
+        request = self.context.get('request', None)
+        query = request and request.query_params.get('search')
+        return highlight(obj.text, query) if query else None
+
     def validate(self, data):
         all_tag = Tag.objects.all().values_list('id')
         if 'tags' in data:
@@ -216,6 +467,21 @@ class RecipeReadSerializer(serializers.ModelSerializer):
                     )
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного добавления и удаления."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_RECIPES_LIMIT,
+    )
+
+
+class CartTagSerializer(serializers.Serializer):
+    """Тег, все рецепты которого добавляются в корзину."""
+    tag = serializers.SlugRelatedField(
+        slug_field='slug', queryset=Tag.objects.all())
+
+
 class FavoriteSerializer(ShortResipeSerializer):
     """Сериализатор избранного"""
 
@@ -237,7 +503,6 @@ class FavoriteSerializer(ShortResipeSerializer):
 
 class FollowSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = User
@@ -262,15 +527,14 @@ class FollowSerializer(CustomUserSerializer):
         )
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(
-            author=obj).order_by('-id')[:int(limit)]
+        if hasattr(obj, 'recipe_previews'):
+            queryset = obj.recipe_previews
+        else:
+            limit = get_recipes_limit(self.context.get('request'))
+            queryset = Recipe.objects.filter(
+                author=obj).order_by('-pub_date', '-id')[:limit]
         return ShortResipeSerializer(queryset, many=True).data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
-
     def create(self, validated_data):
         request = self.context.get('request', None)
         author_id = self.context.get('request').parser_context.get(
@@ -0,0 +1,41 @@
+from food.models import IngredientToRecipe, Recipe
+from rest_framework.test import APIClient
+from users.models import User
+
+IMAGE = 'recipes/images/test.png'
+
+
+def create_user(number):
+    return User.objects.create_user(
+        email=f'user{number}@example.com',
+        username=f'user{number}',
+        first_name='Имя',
+        last_name='Фамилия',
+        password='password',
+    )
+
+
+def create_client(user=None):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+def create_recipes(author, count, tags, ingredients):
+    recipes = []
+    for number in range(count):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=f'Рецепт {number}',
+            text='Описание',
+            cooking_time=10,
+            image=IMAGE,
+        )
+        recipe.tags.set(tags)
+        IngredientToRecipe.objects.bulk_create(
+            IngredientToRecipe(recipe=recipe, ingredient=ingredient, amount=10)
+            for ingredient in ingredients
+        )
+        recipes.append(recipe)
+    return recipes
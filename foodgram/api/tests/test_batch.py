@@ -0,0 +1,77 @@
+from django.test import TestCase
+from food.models import (Favorite, Ingredients, Recipe, ShoppingCart,
+                         ShoppingListItem)
+
+from .factories import create_client, create_recipes, create_user
+
+
+class BatchTestCase(TestCase):
+    """Пакетное добавление и удаление рецептов в избранном и корзине."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.ingredient = Ingredients.objects.create(
+            name='Мука', measurement_unit='г')
+        cls.first, cls.second, cls.third = (
+            recipe.id for recipe in create_recipes(
+                create_user(1), 3, (), (cls.ingredient,)))
+        cls.missing = cls.third + 1
+
+    def setUp(self):
+        self.client = create_client(self.user)
+
+    def change(self, method, path, recipes):
+        response = getattr(self.client, method)(
+            f'/api/recipes/{path}/', {'recipes': recipes}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return {item['id']: item['status'] for item in response.data}
+
+    def counters(self, field):
+        return dict(Recipe.objects.values_list('id', field))
+
+    def test_favorite_outcomes(self):
+        Favorite.objects.create(user=self.user, recipe_id=self.first)
+        self.assertEqual(
+            self.change('post', 'favorite',
+                        [self.first, self.second, self.second, self.missing]),
+            {self.first: 'exists', self.second: 'added',
+             self.missing: 'not_found'},
+        )
+        self.assertEqual(self.counters('favorites_count'), {
+            self.first: 1, self.second: 1, self.third: 0})
+        self.assertEqual(
+            self.change('delete', 'favorite',
+                        [self.first, self.third, self.missing]),
+            {self.first: 'removed', self.third: 'absent',
+             self.missing: 'not_found'},
+        )
+        self.assertEqual(self.counters('favorites_count'), {
+            self.first: 0, self.second: 1, self.third: 0})
+        self.assertEqual(
+            list(Favorite.objects.values_list('recipe', flat=True)),
+            [self.second])
+
+    def test_shopping_cart_outcomes(self):
+        self.assertEqual(
+            self.change('post', 'shopping_cart', [self.first, self.second]),
+            {self.first: 'added', self.second: 'added'},
+        )
+        self.assertEqual(self.counters('in_carts_count'), {
+            self.first: 1, self.second: 1, self.third: 0})
+        self.assertEqual(
+            ShoppingListItem.objects.get(user=self.user).amount, 20)
+        self.assertEqual(
+            self.change('delete', 'shopping_cart', [self.first]),
+            {self.first: 'removed'},
+        )
+        self.assertEqual(self.counters('in_carts_count'), {
+            self.first: 0, self.second: 1, self.third: 0})
+        self.assertEqual(
+            ShoppingListItem.objects.get(user=self.user).amount, 10)
+        self.assertEqual(ShoppingCart.objects.count(), 1)
+
+    def test_invalid_ids(self):
+        response = self.client.post(
+            '/api/recipes/favorite/', {'recipes': []}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,31 @@
+import warnings
+
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+
+class CacheKeyTestCase(TestCase):
+    """Параметры запроса не попадают в ключи, недопустимые в memcached."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, path):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            return self.client.get(path)
+
+    def test_tag_with_spaces(self):
+        response = self.get('/api/recipes/?tags=two%20words')
+        self.assertEqual(response.status_code, 400)
+
+    def test_long_author(self):
+        response = self.get(f'/api/recipes/?author={"1" * 300}')
+        self.assertEqual(response.status_code, 400)
+
+    def test_recipe_pk(self):
+        response = self.get('/api/recipes/%01/')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,75 @@
+from django.test import TestCase
+from food.models import (Favorite, Ingredients, Recipe, ShoppingCart,
+                         ShoppingListItem, Tag)
+
+from .factories import create_client, create_recipes, create_user
+
+
+class CartTestCase(TestCase):
+    """Операции над всей корзиной: очистка, избранное, тег."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                     slug='breakfast')
+        ingredient = Ingredients.objects.create(
+            name='Мука', measurement_unit='г')
+        author = create_user(1)
+        cls.tagged = create_recipes(author, 2, (cls.tag,), (ingredient,))
+        cls.other = create_recipes(author, 2, (), (ingredient,))
+
+    def setUp(self):
+        self.client = create_client(self.user)
+
+    def post(self, path, data=None):
+        response = self.client.post(
+            f'/api/recipes/shopping_cart/{path}/', data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def cart(self):
+        return set(ShoppingCart.objects.filter(
+            user=self.user).values_list('recipe', flat=True))
+
+    def total(self):
+        item = ShoppingListItem.objects.filter(user=self.user).first()
+        return item and item.amount
+
+    def in_carts(self):
+        return sum(Recipe.objects.values_list('in_carts_count', flat=True))
+
+    def test_from_favorites(self):
+        first, second = self.other
+        Favorite.objects.create(user=self.user, recipe=first)
+        Favorite.objects.create(user=self.user, recipe=second)
+        ShoppingCart.objects.create(user=self.user, recipe=first)
+        self.assertEqual(self.post('from_favorites'), {'added': 1})
+        self.assertEqual(self.cart(), {first.id, second.id})
+        self.assertEqual(self.in_carts(), 2)
+        self.assertEqual(self.total(), 20)
+        self.assertEqual(self.post('from_favorites'), {'added': 0})
+        self.assertEqual(self.in_carts(), 2)
+
+    def test_from_tag(self):
+        self.assertEqual(
+            self.post('from_tag', {'tag': 'breakfast'}), {'added': 2})
+        self.assertEqual(
+            self.cart(), {recipe.id for recipe in self.tagged})
+        self.assertEqual(self.in_carts(), 2)
+        self.assertEqual(self.total(), 20)
+        response = self.client.post(
+            '/api/recipes/shopping_cart/from_tag/', {'tag': 'dinner'},
+            format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_clear(self):
+        for recipe in self.tagged + self.other:
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        other = create_user(2)
+        ShoppingCart.objects.create(user=other, recipe=self.other[0])
+        self.assertEqual(self.post('clear'), {'removed': 4})
+        self.assertEqual(self.cart(), set())
+        self.assertIsNone(self.total())
+        self.assertEqual(self.in_carts(), 1)
+        self.assertTrue(ShoppingListItem.objects.filter(user=other).exists())
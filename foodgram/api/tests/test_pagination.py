@@ -0,0 +1,46 @@
+from django.test import TestCase
+from django.utils import timezone
+from food.models import Recipe
+from rest_framework.test import APIClient
+
+from .factories import create_recipes, create_user
+
+
+class KeysetPaginationTestCase(TestCase):
+    """Курсор проходит рецепты с одинаковыми ключами сортировки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_recipes(create_user(0), 45, (), ())
+        Recipe.objects.update(pub_date=timezone.now(), popularity=1)
+        cls.ids = set(Recipe.objects.values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            last = response.data
+            url = last[link]
+        return ids, last
+
+    def check_ordering(self, ordering):
+        ids, last = self.walk(
+            f'/api/recipes/?pagination=cursor&limit=7&ordering={ordering}',
+            'next')
+        self.assertEqual(len(ids), len(self.ids))
+        self.assertEqual(set(ids), self.ids)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        back, _ = self.walk(last['previous'], 'previous')
+        self.assertEqual(len(back), len(set(back)))
+        self.assertEqual(set(back), set(ids[:-len(last['results'])]))
+
+    def test_new(self):
+        self.check_ordering('new')
+
+    def test_popular(self):
+        self.check_ordering('popular')
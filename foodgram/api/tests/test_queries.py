@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.test import TestCase
+from food.models import Ingredients, Tag
+from rest_framework.test import APIClient
+from users.models import Follow
+
+from .factories import create_recipes, create_user
+
+# Запросы на страницу при пустом кэше: пагинация, рецепты, теги,
+# ингредиенты и подписки на авторов страницы.
+RECIPES = 5
+# Пагинация, авторы, подписки и последние рецепты авторов.
+SUBSCRIPTIONS = 4
+
+
+class QueryCountTestCase(TestCase):
+    """Число SQL-запросов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', color='#E26C2D',
+                               slug=f'tag{number}')
+            for number in range(2)
+        ]
+        cls.ingredients = [
+            Ingredients.objects.create(name=f'Продукт {number}',
+                                       measurement_unit='г')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, path, queries):
+        cache.clear()
+        with self.assertNumQueries(queries):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_recipes(self):
+        create_recipes(create_user(1), 20, self.tags, self.ingredients)
+        for limit in (2, 20):
+            with self.subTest(limit=limit):
+                data = self.get(f'/api/recipes/?limit={limit}', RECIPES)
+                self.assertEqual(len(data['results']), limit)
+
+    def test_subscriptions(self):
+        for count in (2, 20):
+            Follow.objects.filter(user=self.user).delete()
+            for number in range(count):
+                author = create_user(100 * count + number)
+                create_recipes(author, 2, self.tags, self.ingredients)
+                Follow.objects.create(user=self.user, author=author)
+            with self.subTest(authors=count):
+                data = self.get(
+                    '/api/users/subscriptions/?limit=20', SUBSCRIPTIONS)
+                self.assertEqual(len(data['results']), count)
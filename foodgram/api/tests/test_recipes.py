@@ -0,0 +1,64 @@
+from django.test import TestCase
+from food.models import Ingredients, IngredientToRecipe, Recipe
+
+from .factories import create_client, create_user
+
+
+class RecipeWriteTestCase(TestCase):
+    """Создание и частичное изменение рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.first, cls.second = (
+            Ingredients.objects.create(name=f'Продукт {number}',
+                                       measurement_unit='г')
+            for number in range(2)
+        )
+
+    def setUp(self):
+        self.client = create_client(self.user)
+
+    def create(self, ingredients):
+        return self.client.post('/api/recipes/', {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'ingredients': ingredients,
+        }, format='json')
+
+    def test_create_without_tags(self):
+        response = self.create([{'id': self.first.id, 'amount': 10}])
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Recipe.objects.get().tags.exists())
+
+    def test_repeated_ingredients(self):
+        response = self.create([
+            {'id': self.first.id, 'amount': 10},
+            {'id': self.first.id, 'amount': 20},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_partial_update_keeps_ingredients(self):
+        self.create([
+            {'id': self.first.id, 'amount': 10},
+            {'id': self.second.id, 'amount': 20},
+        ])
+        recipe = Recipe.objects.get()
+        response = self.client.patch(
+            f'/api/recipes/{recipe.id}/', {'name': 'Новое название'},
+            format='json')
+        self.assertEqual(response.status_code, 200)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(
+            IngredientToRecipe.objects.filter(recipe=recipe).count(), 2)
+
+    def test_empty_ingredients(self):
+        self.create([{'id': self.first.id, 'amount': 10}])
+        recipe = Recipe.objects.get()
+        response = self.client.patch(
+            f'/api/recipes/{recipe.id}/', {'ingredients': []},
+            format='json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,70 @@
+from django.test import SimpleTestCase, TestCase
+from food.models import Ingredients, IngredientToRecipe, Recipe
+from food.search import highlight
+from rest_framework.test import APIClient
+
+from .factories import IMAGE, create_user
+
+
+class HighlightTestCase(SimpleTestCase):
+    """Выделение совпадений без PostgreSQL."""
+
+    def test_words(self):
+        self.assertEqual(
+            highlight('Тесто на кефире', 'тесто кефире'),
+            '<b>Тесто</b> на <b>кефире</b>')
+
+    def test_special_characters(self):
+        self.assertEqual(highlight('1+1 (два)', '1+1'), '<b>1+1</b> (два)')
+
+    def test_empty_query(self):
+        self.assertIsNone(highlight('Тесто', '  '))
+
+
+class SearchFallbackTestCase(TestCase):
+    """Поиск подстроки, когда база не PostgreSQL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user(0)
+        cls.in_text, cls.in_ingredients, cls.in_name, cls.other = (
+            Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=10,
+                image=IMAGE)
+            for name, text in (
+                ('Оладьи', 'Жарить на сливочном масле'),
+                ('Бутерброд', 'Намазать на хлеб'),
+                ('Каша с маслом', 'Варить на молоке'),
+                ('Омлет', 'Взбить яйца'),
+            )
+        )
+        IngredientToRecipe.objects.bulk_create(
+            IngredientToRecipe(
+                recipe=cls.in_ingredients, amount=10,
+                ingredient=Ingredients.objects.create(
+                    name=name, measurement_unit='г'))
+            for name in ('масло сливочное', 'масло топленое')
+        )
+
+    def search(self, text):
+        response = APIClient().get('/api/recipes/', {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_name_matches_first(self):
+        self.assertEqual(
+            [recipe['id'] for recipe in self.search('масл')],
+            [self.in_name.id, self.in_ingredients.id, self.in_text.id])
+
+    def test_headline(self):
+        headlines = {
+            recipe['id']: recipe['search_headline']
+            for recipe in self.search('масл')
+        }
+        self.assertEqual(
+            headlines[self.in_text.id], 'Жарить на сливочном <b>масл</b>е')
+        self.assertEqual(
+            headlines[self.in_ingredients.id], 'Намазать на хлеб')
+
+    def test_no_matches(self):
+        self.assertEqual(self.search('борщ'), [])
@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase
+from food.models import Ingredients, IngredientToRecipe, ShoppingCart
+from food.shopping_list import merged_items
+from food.units import format_amount, present
+
+from .factories import create_client, create_recipes, create_user
+
+
+class PresentTestCase(SimpleTestCase):
+    """Вывод суммы в единицах продукта."""
+
+    def test_single_unit_is_kept(self):
+        self.assertEqual(
+            present('мл', Decimal(30), {'ст. л.'}), ('ст. л.', '2'))
+
+    def test_rounding(self):
+        self.assertEqual(
+            present('мл', Decimal(10), {'ст. л.'}), ('ст. л.', '0.667'))
+        self.assertEqual(
+            present('г', Decimal('1000.0004'), {'г', 'кг'}), ('кг', '1'))
+
+    def test_large_unit(self):
+        self.assertEqual(
+            present('г', Decimal(1500), {'г', 'кг'}), ('кг', '1.5'))
+        self.assertEqual(
+            present('мл', Decimal(999), {'мл', 'л'}), ('мл', '999'))
+
+    def test_unknown_unit(self):
+        self.assertEqual(
+            present('пучок', Decimal(3), {'пучок'}), ('пучок', '3'))
+
+    def test_no_exponent(self):
+        self.assertEqual(format_amount(Decimal('1E+3')), '1000')
+        self.assertEqual(format_amount(Decimal('0.500')), '0.5')
+
+
+class MergedItemsTestCase(TestCase):
+    """Продукты с одним названием складываются в совместимых единицах."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.recipes = create_recipes(cls.user, 2, (), ())
+
+    def add(self, recipe, name, unit, amount):
+        ingredient, _ = Ingredients.objects.get_or_create(
+            name=name, measurement_unit=unit)
+        IngredientToRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=Decimal(amount))
+
+    def items(self):
+        for recipe in self.recipes:
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        return {
+            (item['name'], item['measurement_unit']): item['amount']
+            for item in merged_items(self.user)
+        }
+
+    def test_mixed_units(self):
+        first, second = self.recipes
+        self.add(first, 'Мука', 'г', '200')
+        self.add(second, 'Мука', 'кг', '0.75')
+        self.add(first, 'Молоко', 'мл', '500')
+        self.add(second, 'Молоко', 'л', '1')
+        self.assertEqual(self.items(), {
+            ('Молоко', 'л'): '1.5',
+            ('Мука', 'г'): '950',
+        })
+
+    def test_units_not_in_conversions(self):
+        first, second = self.recipes
+        self.add(first, 'Укроп', 'пучок', '1')
+        self.add(second, 'Укроп', 'пучок', '2')
+        self.add(first, 'Соль', 'по вкусу', '1')
+        self.add(second, 'Соль', 'г', '5')
+        self.assertEqual(self.items(), {
+            ('Соль', 'г'): '5',
+            ('Соль', 'по вкусу'): '1',
+            ('Укроп', 'пучок'): '3',
+        })
+
+    def test_mass_and_volume_apart(self):
+        first, second = self.recipes
+        self.add(first, 'Сахар', 'г', '100')
+        self.add(second, 'Сахар', 'ст. л.', '2')
+        self.assertEqual(self.items(), {
+            ('Сахар', 'г'): '100',
+            ('Сахар', 'ст. л.'): '2',
+        })
+
+    def test_download(self):
+        first, second = self.recipes
+        self.add(first, 'Мука', 'г', '200')
+        self.add(second, 'Мука', 'кг', '0.75')
+        self.items()
+        response = create_client(self.user).get(
+            '/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'Мука (г) - 950', b''.join(response.streaming_content).decode())
@@ -1,11 +1,22 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import re
+
+from django.conf import settings
+from django.db.models import BooleanField, Exists, F, OuterRef, Value, Window
+from django.db.models.functions import RowNumber
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from food.models import (Favorite, Ingredients, IngredientToRecipe, Recipe,
-                         ShoppingCart, Tag)
-from rest_framework import filters, mixins, serializers, status, viewsets
+from food.batch import (add_recipes, clear_cart, favorites_to_cart,
+                        remove_recipes, tag_to_cart)
+from food.cache import (INGREDIENTS, POPULARITY, RECIPES, TAGS,
+                        author_namespace, recipe_namespace, tag_namespace)
+from food.coverage_index import get_coverage_index
+from food.feed import get_timeline
+from food.ingredient_index import get_index
+from food.models import Favorite, Ingredients, Recipe, ShoppingCart, Tag
+from food.shopping_list import merged_items
+from rest_framework import mixins, serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
@@ -13,12 +24,22 @@ from rest_framework.response import Response
 from users.models import Follow, User
 
 from .filters import IngredientFilter, MyFilterSet
-from .pagination import CustomPagination
+from .mixins import AnonymousCacheMixin, CachedReferenceMixin
+from .pagination import (CustomPagination, FeedPagination, TimelinePagination,
+                         get_limit, get_recipes_limit)
 from .premissions import AuthorOrReadOnly
-from .serializers import (CustomUserSerializer, FavoriteSerializer,
-                          FollowSerializer, IngredientsSerializer,
-                          RecipeCreateSerializer, RecipeReadSerializer,
-                          ShoppingCartSerializer, TagSerializer)
+from .renderers import (FormatContentNegotiation, ShoppingListCSVRenderer,
+                        ShoppingListPDFRenderer, ShoppingListTextRenderer)
+from .serializers import (CartTagSerializer, CustomUserSerializer,
+                          FavoriteSerializer, FollowSerializer,
+                          IngredientsSerializer, RecipeCreateSerializer,
+                          RecipeIdsSerializer, RecipeReadSerializer,
+                          ShoppingCartSerializer, TagSerializer,
+                          get_followed_ids)
+
+# Значения, которые попадают в ключи версий memcached как есть.
+CACHE_ID = re.compile(r'[0-9]{1,18}')
+CACHE_SLUG = re.compile(r'[-a-zA-Z0-9_]{1,50}')
 
 
 class CustomUserViewSet(UserViewSet):
@@ -32,12 +53,46 @@ class CustomUserViewSet(UserViewSet):
 
 class FollowListViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     serializer_class = FollowSerializer
-    pagination_class = CustomPagination
+    pagination_class = FeedPagination
+    cursor_ordering = ('id',)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
         return User.objects.filter(following__user=self.request.user)
 
+    def paginate_queryset(self, queryset):
+        authors = super().paginate_queryset(queryset)
+        if authors is not None:
+            self.attach_recipe_previews(
+                authors, get_recipes_limit(self.request))
+        return authors
+
+    @staticmethod
+    def attach_recipe_previews(authors, limit):
+        """
+        Последние рецепты всех авторов страницы одним запросом:
+        ROW_NUMBER по автору, затем отбор первых limit строк.
+        """
+        previews = {author.id: [] for author in authors}
+        if limit and previews:
+            ranked = Recipe.objects.filter(
+                author__in=previews
+            ).annotate(recipe_rank=Window(
+                expression=RowNumber(),
+                partition_by=F('author'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )).order_by()
+            sql, params = ranked.query.sql_with_params()
+            recipes = Recipe.objects.raw(
+                f'SELECT * FROM ({sql}) ranked WHERE recipe_rank <= %s '
+                f'ORDER BY author_id, recipe_rank',
+                (*params, limit),
+            )
+            for recipe in recipes:
+                previews[recipe.author_id].append(recipe)
+        for author in authors:
+            author.recipe_previews = previews[author.id]
+
 
 class FollowViewSet(
     mixins.CreateModelMixin,
@@ -62,45 +117,224 @@ class FollowViewSet(
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
+class RecipeViewSet(AnonymousCacheMixin, viewsets.ModelViewSet):
     serializer_class = RecipeCreateSerializer
     filter_backends = (DjangoFilterBackend,)
-    filter_class = MyFilterSet
-    pagination_class = CustomPagination
+    filterset_class = MyFilterSet
+    pagination_class = FeedPagination
     permission_classes = (AuthorOrReadOnly, )
+    cache_query_params = (
+        'page', 'limit', 'tags', 'tags_mode', 'author', 'ordering',
+        'pagination', 'cursor',
+    )
+
+    @property
+    def cursor_ordering(self):
+        return MyFilterSet.get_ordering(
+            self.request.query_params.get('ordering'))
+
+    def get_queryset(self):
+        user = self.request.user
+        # Теги и ингредиенты подгружает сериализатор, только для
+        # рецептов, которых нет в кэше.
+        queryset = Recipe.objects.select_related('author')
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
+
+    def get_cache_namespaces(self, params):
+        """
+        Страница зависит только от рецептов, попадающих под фильтр:
+        рецепт меняет версии своего автора и тегов, а общую версию
+        списка - только вместе с ними. Значения, которые не могут быть
+        id или slug, не кэшируются: ключ memcached не может содержать
+        пробелы и длиннее 250 байт.
+        """
+        namespaces = [TAGS, INGREDIENTS]
+        if self.action == 'retrieve':
+            if not CACHE_ID.fullmatch(str(self.kwargs['pk'])):
+                return None
+            namespaces.append(recipe_namespace(self.kwargs['pk']))
+        elif 'author' in params:
+            if not all(map(CACHE_ID.fullmatch, params['author'])):
+                return None
+            namespaces.extend(map(author_namespace, params['author']))
+        elif 'tags' in params:
+            if not all(map(CACHE_SLUG.fullmatch, params['tags'])):
+                return None
+            namespaces.extend(map(tag_namespace, params['tags']))
+        else:
+            namespaces.append(RECIPES)
+        if params.get('ordering') == ['popular']:
+            namespaces.append(POPULARITY)
+        return namespaces
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeReadSerializer
         return RecipeCreateSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['image_rendition'] = (
+            'image_thumbnail' if self.action in ('list', 'feed', 'cook')
+            else 'image_detail')
+        return context
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(IsAuthenticated,),
+    )
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь."""
+        author_ids = get_followed_ids(request)
+        paginator = TimelinePagination()
+        recipes = paginator.paginate(
+            request,
+            self.get_queryset().filter(author__in=author_ids),
+            get_timeline(request.user.id, author_ids),
+        )
+        serializer = self.get_serializer(recipes, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+    )
+    def cook(self, request):
+        """
+        Рецепты из имеющихся ингредиентов: сначала те, для которых
+        есть большая доля ингредиентов.
+        """
+        try:
+            ingredient_ids = [
+                int(value)
+                for value in request.query_params.getlist('ingredients')
+            ]
+        except ValueError:
+            raise serializers.ValidationError({
+                'ingredients': 'Укажите id ингредиентов'
+            })
+        limit = min(
+            get_limit(request) or settings.COOK_RESULTS_LIMIT,
+            settings.COOK_RESULTS_LIMIT,
+        )
+        ranked = get_coverage_index().search(ingredient_ids, limit)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in ranked])
+        ranked = [row for row in ranked if row[0] in recipes]
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id, _, _ in ranked], many=True)
+        results = serializer.data
+        for data, (_, matched, total) in zip(results, ranked):
+            data['matched_ingredients'] = matched
+            data['missing_ingredients'] = total - matched
+            data['coverage'] = round(matched / total, 3)
+        return Response(results)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=(IsAuthenticated,),
+        url_path='favorite',
+    )
+    def favorite_batch(self, request):
+        return self.change_batch(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart',
+    )
+    def shopping_cart_batch(self, request):
+        return self.change_batch(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart/clear',
+    )
+    def clear_shopping_cart(self, request):
+        return Response({'removed': clear_cart(request.user)})
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart/from_favorites',
+    )
+    def shopping_cart_from_favorites(self, request):
+        return Response({'added': favorites_to_cart(request.user)})
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart/from_tag',
+    )
+    def shopping_cart_from_tag(self, request):
+        serializer = CartTagSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'added': tag_to_cart(
+            request.user, serializer.validated_data['tag'])})
+
     @staticmethod
-    def send_message(ingredients):
-
-        shopping_list = 'Купить в магазине:'
-        for ingredient in ingredients:
-            shopping_list += (
-                f"\n{ingredient['ingredient__name']} "
-                f"({ingredient['ingredient__measurement_unit']}) - "
-                f"{ingredient['amount']}")
-        file = 'shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename="{file}.txt"'
+    def change_batch(request, model):
+        """
+        Пакетное добавление (POST) или удаление (DELETE) рецептов:
+        итог для каждого id вместо ошибки на первом же повторе.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        change = add_recipes if request.method == 'POST' else remove_recipes
+        outcomes = change(
+            model, request.user, serializer.validated_data['recipes'])
+        return Response([
+            {'id': recipe_id, 'status': outcome}
+            for recipe_id, outcome in outcomes.items()
+        ])
+
+    @staticmethod
+    def send_message(ingredients, renderer):
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients), content_type=content_type)
+        file = f'shopping_list.{renderer.format}'
+        response['Content-Disposition'] = f'attachment; filename="{file}"'
         return response
 
-    @action(detail=False, methods=['GET'])
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=FormatContentNegotiation,
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListPDFRenderer,
+        ),
+    )
     def download_shopping_cart(self, request):
-
-        ingredients = IngredientToRecipe.objects.filter(
-            recipe__shopping_list__user=request.user
-        ).order_by('ingredient__name').values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        return self.send_message(ingredients)
+        return self.send_message(
+            merged_items(request.user), request.accepted_renderer)
 
 
 class TagViewSet(
+    CachedReferenceMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet
@@ -108,15 +342,29 @@ class TagViewSet(
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    cache_namespace = TAGS
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    CachedReferenceMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     queryset = Ingredients.objects.all()
     serializer_class = IngredientsSerializer
     pagination_class = None
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     filter_backends = (IngredientFilter, )
-    search_fields = ('^name', )
+    cache_namespace = INGREDIENTS
+
+    def list(self, request, *args, **kwargs):
+        return self.cache_response(request, self.search)
+
+    def search(self, request):
+        limit = get_limit(request)
+        if settings.INGREDIENT_SEARCH_INDEX:
+            return Response(get_index().search(
+                request.query_params.get('name', ''), limit))
+        queryset = self.filter_queryset(self.get_queryset())[:limit]
+        return Response(self.get_serializer(queryset, many=True).data)
 
 
 class FavoriteViewSet(
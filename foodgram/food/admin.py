@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from . import models
+from .search import is_supported, search_recipes
 
 
 @admin.register(models.Tag)
@@ -24,11 +25,16 @@ class IngredientToRecipeInLine(admin.TabularInline):
 
 @admin.register(models.Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('author', 'name',)
+    list_display = ('author', 'name', 'favorites_count', 'in_carts_count')
     search_fields = ('name',)
     list_filter = ('author', 'name', 'tags')
     inlines = (IngredientToRecipeInLine,)
 
+    def get_search_results(self, request, queryset, search_term):
+        if search_term and is_supported():
+            return search_recipes(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
 
 @admin.register(models.Favorite)
 class Favorite(admin.ModelAdmin):
@@ -42,3 +48,17 @@ class ShoppingCart(admin.ModelAdmin):
     list_display = ('user', 'recipe')
     search_fields = ('user', 'recipe')
     list_filter = ('user', 'recipe')
+
+
+@admin.register(models.ShoppingListItem)
+class ShoppingListItem(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    search_fields = ('user__email', 'ingredient__name')
+    list_filter = ('user',)
+
+
+@admin.register(models.Job)
+class Job(admin.ModelAdmin):
+    list_display = ('task', 'status', 'attempts', 'run_after')
+    search_fields = ('task',)
+    list_filter = ('status', 'task')
@@ -0,0 +1,162 @@
+from django.db import connection, transaction
+from django.db.models import (DateTimeField, Exists, F, IntegerField, OuterRef,
+                              Value)
+from django.utils import timezone
+
+from .counters import change_counters
+from .models import (Favorite, IngredientToRecipe, Recipe, ShoppingCart,
+                     ShoppingListItem)
+from .shopping_list import refresh_shopping_lists
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+
+# Список рецептов пользователя и счетчик рецепта, который он меняет.
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def find_recipes(model, user, recipe_ids):
+    """
+    Одним запросом: какие рецепты существуют и какие из них
+    уже есть у пользователя.
+    """
+    return dict(Recipe.objects.filter(pk__in=recipe_ids).annotate(
+        present=Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk')))
+    ).values_list('id', 'present'))
+
+
+def recipes_changed(model, user, recipe_ids, delta):
+    """
+    Массовые INSERT и DELETE не отправляют сигналов, поэтому
+    счетчики и список покупок обновляются здесь.
+    """
+    change_counters(Recipe, recipe_ids, COUNTER_FIELDS[model], delta)
+    if model is ShoppingCart:
+        refresh_shopping_lists(
+            [user.id],
+            IngredientToRecipe.objects.filter(
+                recipe__in=recipe_ids).values_list('ingredient', flat=True),
+        )
+
+
+def delete_rows(model, user, recipe_ids=None):
+    """
+    Один DELETE строк пользователя, без выборки строк и сигналов
+    на каждую. recipe_ids=None - все строки.
+    """
+    meta = model._meta
+    quote = connection.ops.quote_name
+    sql = (f'DELETE FROM {quote(meta.db_table)} '
+           f'WHERE {quote(meta.get_field("user").column)} = %s')
+    params = [user.id]
+    if recipe_ids is not None:
+        sql += (f' AND {quote(meta.get_field("recipe").column)} IN '
+                f'({", ".join(["%s"] * len(recipe_ids))})')
+        params.extend(recipe_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def insert_rows(model, user, recipes):
+    """
+    INSERT ... SELECT: рецепты из queryset recipes добавляются
+    пользователю одним запросом, уже добавленные пропускаются.
+    """
+    select = recipes.order_by().annotate(
+        row_user=Value(user.id, output_field=IntegerField()),
+        row_recipe=F('id'),
+        row_created=Value(timezone.now(), output_field=DateTimeField()),
+    ).values_list('row_user', 'row_recipe', 'row_created')
+    sql, params = select.query.sql_with_params()
+    meta = model._meta
+    ops = connection.ops
+    columns = ', '.join(
+        ops.quote_name(meta.get_field(name).column)
+        for name in ('user', 'recipe', 'created')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{ops.quote_name(meta.db_table)} ({columns}) {sql} '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            params,
+        )
+        return cursor.rowcount
+
+
+@transaction.atomic
+def add_recipes(model, user, recipe_ids):
+    """Добавляет рецепты в избранное или корзину, итог по каждому id."""
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    found = find_recipes(model, user, recipe_ids)
+    added = [pk for pk in recipe_ids if pk in found and not found[pk]]
+    if added:
+        model.objects.bulk_create(
+            (model(user=user, recipe_id=pk) for pk in added),
+            ignore_conflicts=True,
+        )
+        recipes_changed(model, user, added, 1)
+    return {
+        pk: NOT_FOUND if pk not in found else EXISTS if found[pk] else ADDED
+        for pk in recipe_ids
+    }
+
+
+@transaction.atomic
+def remove_recipes(model, user, recipe_ids):
+    """Удаляет рецепты из избранного или корзины одним DELETE ... IN."""
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    found = find_recipes(model, user, recipe_ids)
+    removed = [pk for pk in recipe_ids if found.get(pk)]
+    if removed:
+        delete_rows(model, user, removed)
+        recipes_changed(model, user, removed, -1)
+    return {
+        pk: NOT_FOUND if pk not in found else REMOVED if found[pk] else ABSENT
+        for pk in recipe_ids
+    }
+
+
+@transaction.atomic
+def clear_cart(user):
+    """Очищает корзину и список покупок, не читая строк корзины."""
+    change_counters(
+        Recipe, ShoppingCart.objects.filter(user=user).values('recipe'),
+        'in_carts_count', -1)
+    ShoppingListItem.objects.filter(user=user).delete()
+    return delete_rows(ShoppingCart, user)
+
+
+@transaction.atomic
+def fill_cart(user, recipes):
+    """
+    Добавляет в корзину рецепты из queryset recipes. Счетчики
+    меняются тем же подзапросом до вставки, список покупок
+    пересчитывается один раз. Возвращает число добавленных.
+    """
+    recipes = recipes.exclude(
+        pk__in=ShoppingCart.objects.filter(user=user).values('recipe'))
+    change_counters(Recipe, recipes.values('id'), 'in_carts_count', 1)
+    added = insert_rows(ShoppingCart, user, recipes)
+    if added:
+        refresh_shopping_lists([user.id])
+    return added
+
+
+def favorites_to_cart(user):
+    return fill_cart(user, Recipe.objects.filter(
+        pk__in=Favorite.objects.filter(user=user).values('recipe')))
+
+
+def tag_to_cart(user, tag):
+    return fill_cart(user, Recipe.objects.filter(
+        pk__in=Recipe.tags.through.objects.filter(
+            tag=tag).values('recipe')))
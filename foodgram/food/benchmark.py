@@ -0,0 +1,177 @@
+import json
+import math
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follow
+
+from .models import (Favorite, Ingredients, IngredientToRecipe, Recipe,
+                     ShoppingCart, Tag)
+from .synthetic import WORDS
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def make_client(user=None):
+    """
+    Клиент ходит через весь стек middleware и авторизуется
+    настоящим токеном, как фронтенд.
+    """
+    host = next(
+        (
+            host for host in settings.ALLOWED_HOSTS
+            if host != '*' and not host.startswith('.')
+        ),
+        'localhost',
+    )
+    client = APIClient(HTTP_HOST=host)
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def build_scenarios(user):
+    """
+    Сценарии: имя, авторизован ли клиент, метод, адрес и тело.
+    Параметры берутся из данных пользователя, чтобы фильтры
+    что-то находили. Рецепт создается без картинки: откат
+    транзакции не удаляет сохраненный файл.
+    """
+    recipe = Recipe.objects.order_by('-favorites_count', '-id').first()
+    tags = list(Tag.objects.order_by('id').values_list('slug', flat=True)[:2])
+    author = Follow.objects.filter(user=user).values_list(
+        'author', flat=True).first() or recipe.author_id
+    ingredients = list(IngredientToRecipe.objects.filter(
+        recipe=recipe).values_list('ingredient', flat=True))
+    ingredient = Ingredients.objects.filter(
+        id__in=ingredients).values_list('name', flat=True).first() or ''
+    cook = '&'.join(f'ingredients={pk}' for pk in ingredients[:5])
+    tag_filter = '&'.join(f'tags={slug}' for slug in tags)
+    return (
+        ('recipes_anonymous', False, 'get', '/api/recipes/', None),
+        ('recipes', True, 'get', '/api/recipes/', None),
+        ('recipes_tags', True, 'get', f'/api/recipes/?{tag_filter}', None),
+        ('recipes_author', True, 'get',
+         f'/api/recipes/?author={author}', None),
+        ('recipes_favorited', True, 'get',
+         '/api/recipes/?is_favorited=1', None),
+        ('recipes_in_cart', True, 'get',
+         '/api/recipes/?is_in_shopping_cart=1', None),
+        ('recipes_popular', True, 'get',
+         '/api/recipes/?ordering=popular', None),
+        ('recipes_search', True, 'get',
+         f'/api/recipes/?search={WORDS[0]}', None),
+        ('recipe_detail', True, 'get', f'/api/recipes/{recipe.id}/', None),
+        ('recipes_feed', True, 'get', '/api/recipes/feed/', None),
+        ('recipes_cook', True, 'get', f'/api/recipes/cook/?{cook}', None),
+        ('subscriptions', True, 'get', '/api/users/subscriptions/', None),
+        ('download_shopping_cart', True, 'get',
+         '/api/recipes/download_shopping_cart/', None),
+        ('ingredients_search', False, 'get',
+         f'/api/ingredients/?name={ingredient[:3]}', None),
+        ('recipe_create', True, 'post', '/api/recipes/', {
+            'name': 'Замер создания рецепта',
+            'text': ' '.join(WORDS),
+            'cooking_time': 30,
+            'tags': list(Tag.objects.filter(
+                slug__in=tags).values_list('id', flat=True)),
+            'ingredients': [
+                {'id': pk, 'amount': 100} for pk in ingredients[:5]
+            ],
+        }),
+    )
+
+
+def measure(client, method, path, data):
+    """
+    Время и число SQL-запросов одного запроса. Изменения
+    откатываются, чтобы повторы шли на одних и тех же данных.
+    """
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            if data is None:
+                response = getattr(client, method)(path)
+            else:
+                response = getattr(client, method)(
+                    path, data, format='json')
+            response.getvalue()
+            duration = time.perf_counter() - started
+        transaction.set_rollback(True)
+    return response.status_code, duration, len(queries)
+
+
+def run(user, iterations=50, warmup=5, only=None):
+    clients = {False: make_client(), True: make_client(user)}
+    results = {}
+    for name, authorized, method, path, data in build_scenarios(user):
+        if only and name not in only:
+            continue
+        client = clients[authorized]
+        for _ in range(warmup):
+            measure(client, method, path, data)
+        durations, counts, statuses = [], [], set()
+        for _ in range(iterations):
+            status, duration, count = measure(client, method, path, data)
+            statuses.add(status)
+            durations.append(duration * 1000)
+            counts.append(count)
+        results[name] = {
+            'path': path,
+            'status': sorted(statuses),
+            'p50_ms': round(percentile(durations, 50), 3),
+            'p95_ms': round(percentile(durations, 95), 3),
+            'mean_ms': round(sum(durations) / len(durations), 3),
+            'queries': percentile(counts, 50),
+            'queries_max': max(counts),
+        }
+    return {
+        'meta': {
+            'started': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'recipes': Recipe.objects.count(),
+            'favorites': Favorite.objects.count(),
+            'carts': ShoppingCart.objects.count(),
+            'follows': Follow.objects.count(),
+            'iterations': iterations,
+            'warmup': warmup,
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """
+    Регрессии относительно прошлого прогона: p95 вырос больше чем
+    на tolerance процентов или стало больше SQL-запросов.
+    """
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        limit = previous['p95_ms'] * (1 + tolerance / 100)
+        if current['p95_ms'] > limit:
+            regressions.append(
+                f'{name}: p95 {previous["p95_ms"]} -> '
+                f'{current["p95_ms"]} мс')
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: SQL {previous["queries"]} -> '
+                f'{current["queries"]}')
+    return regressions
+
+
+def dump(report):
+    return json.dumps(report, ensure_ascii=False, indent=2)
@@ -0,0 +1,95 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Recipe
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+RECIPES = 'recipes'
+POPULARITY = 'popularity'
+
+
+def recipe_namespace(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def author_namespace(author_id):
+    return f'author:{author_id}'
+
+
+def tag_namespace(slug):
+    return f'tag:{slug}'
+
+
+def _version_key(namespace):
+    return f'{namespace}:version'
+
+
+def _new_version():
+    """Версия - время изменения в миллисекундах."""
+    return int(time.time() * 1000)
+
+
+def get_version(namespace):
+    """
+    Версия данных справочника. Если ключ версии вытеснен из кэша,
+    создается новая, поэтому старые ответы не могут вернуться.
+    """
+    version = cache.get(_version_key(namespace))
+    if version is not None:
+        return version
+    cache.add(_version_key(namespace), _new_version(), None)
+    return cache.get(_version_key(namespace), _new_version())
+
+
+def get_versions(namespaces):
+    """Версии нескольких пространств за одно обращение к кэшу."""
+    found = cache.get_many([_version_key(name) for name in namespaces])
+    return tuple(
+        found.get(_version_key(name)) or get_version(name)
+        for name in namespaces
+    )
+
+
+def bump_versions(namespaces):
+    keys = [_version_key(name) for name in namespaces]
+    if not keys:
+        return
+    current = cache.get_many(keys)
+    version = _new_version()
+    cache.set_many(
+        {key: max(version, current.get(key, 0) + 1) for key in keys}, None)
+
+
+def bump_version(namespace):
+    bump_versions((namespace,))
+
+
+def bump_on_commit(namespaces):
+    """
+    Версии меняются после коммита: иначе параллельный запрос успеет
+    закэшировать старые данные уже под новой версией.
+    """
+    namespaces = tuple(namespaces)
+    if namespaces:
+        transaction.on_commit(lambda: bump_versions(namespaces))
+
+
+def recipe_namespaces(recipes):
+    """
+    Версии, от которых зависят закэшированные ответы с этими
+    рецептами: сам рецепт, его автор, теги и общий список.
+    recipes - id или queryset.
+    """
+    namespaces = set()
+    for recipe_id, author_id, slug in Recipe.objects.filter(
+        pk__in=recipes
+    ).values_list('id', 'author', 'tags__slug'):
+        namespaces.update((
+            RECIPES, recipe_namespace(recipe_id), author_namespace(author_id)
+        ))
+        if slug:
+            namespaces.add(tag_namespace(slug))
+    return namespaces
@@ -0,0 +1,64 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete
+from users.models import Follow, User
+
+from .models import Favorite, Recipe, ShoppingCart
+
+# Счетчик, модель со строками, которые он считает, и ее внешний ключ.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def change_counters(model, pks, field, delta):
+    """Атомарное изменение счетчиков одним UPDATE, без чтения строк."""
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+def change_counter(model, pk, field, delta):
+    change_counters(model, (pk,), field, delta)
+
+
+def signal_delta(signal, created=False, raw=False, **kwargs):
+    """+1 для новой строки, -1 для удаленной, 0 для остальных сохранений."""
+    if raw:
+        return 0
+    if signal is post_delete:
+        return -1
+    return 1 if created else 0
+
+
+def actual_count(related, fk):
+    return Coalesce(Subquery(
+        related.objects.filter(
+            **{fk: OuterRef('pk')}
+        ).order_by().values(fk).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def find_drift():
+    """Строки, у которых счетчик разошелся с реальным количеством."""
+    for model, field, related, fk in COUNTERS:
+        rows = model.objects.annotate(
+            actual=actual_count(related, fk)
+        ).exclude(**{field: F('actual')}).values_list('pk', field, 'actual')
+        for pk, stored, actual in rows:
+            yield model, field, pk, stored, actual
+
+
+def reconcile_counters():
+    """Пересчитывает разошедшиеся счетчики, возвращает число исправлений."""
+    fixed = 0
+    for model, field, related, fk in COUNTERS:
+        drifted = list(model.objects.annotate(
+            actual=actual_count(related, fk)
+        ).exclude(**{field: F('actual')}).values_list('pk', flat=True))
+        if drifted:
+            fixed += model.objects.filter(pk__in=drifted).update(
+                **{field: actual_count(related, fk)})
+    return fixed
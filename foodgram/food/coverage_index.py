@@ -0,0 +1,185 @@
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from heapq import nlargest
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import IngredientToRecipe
+
+SEQUENCE_KEY = 'coverage:sequence'
+
+
+def _change_key(number):
+    return f'coverage:change:{number}'
+
+
+def get_sequence():
+    cache.add(SEQUENCE_KEY, 0, None)
+    return cache.get(SEQUENCE_KEY, 0)
+
+
+def record_change(recipe_id):
+    """
+    Отмечает, что ингредиенты рецепта изменились. Запись делается
+    после коммита, чтобы индекс не перечитал старые данные.
+    """
+    def record():
+        get_sequence()
+        number = cache.incr(SEQUENCE_KEY)
+        cache.set(
+            _change_key(number), recipe_id, settings.COVERAGE_INDEX_TTL)
+    transaction.on_commit(record)
+
+
+def reset_coverage_index():
+    """
+    Номер журнала сдвигается дальше его размера: все процессы
+    пересоберут индекс целиком при следующем обращении.
+    """
+    get_sequence()
+    cache.incr(SEQUENCE_KEY, settings.COVERAGE_JOURNAL_SIZE + 1)
+
+
+class CoverageIndex:
+    """
+    Обратный индекс: ингредиент -> массив id рецептов с ним.
+    Рецепты ранжируются по доле своих ингредиентов, которые есть
+    у пользователя.
+    """
+
+    def __init__(self, rows):
+        self.recipes = {}
+        postings = defaultdict(list)
+        for recipe_id, group in groupby(rows, key=itemgetter(0)):
+            ingredients = tuple(ingredient for _, ingredient in group)
+            self.recipes[recipe_id] = ingredients
+            for ingredient in ingredients:
+                postings[ingredient].append(recipe_id)
+        self.postings = {
+            ingredient: array('I', recipe_ids)
+            for ingredient, recipe_ids in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def update(self, recipe_ids, rows):
+        """
+        Заменяет ингредиенты рецептов. Списки рецептов не меняются
+        на месте, а подменяются новыми, поэтому читать индекс можно
+        во время обновления.
+        """
+        fresh = defaultdict(tuple)
+        for recipe_id, group in groupby(rows, key=itemgetter(0)):
+            fresh[recipe_id] = tuple(ingredient for _, ingredient in group)
+        changed = defaultdict(lambda: [set(), set()])
+        for recipe_id in recipe_ids:
+            old = set(self.recipes.get(recipe_id, ()))
+            new = set(fresh[recipe_id])
+            for ingredient in old - new:
+                changed[ingredient][0].add(recipe_id)
+            for ingredient in new - old:
+                changed[ingredient][1].add(recipe_id)
+        for ingredient, (removed, added) in changed.items():
+            posting = [
+                recipe_id
+                for recipe_id in self.postings.get(ingredient, ())
+                if recipe_id not in removed
+            ]
+            posting.extend(added)
+            self.postings[ingredient] = array('I', posting)
+        for recipe_id in recipe_ids:
+            if fresh[recipe_id]:
+                self.recipes[recipe_id] = fresh[recipe_id]
+            else:
+                self.recipes.pop(recipe_id, None)
+
+    def search(self, ingredient_ids, limit):
+        """
+        Список (id рецепта, найдено ингредиентов, всего ингредиентов):
+        сначала большая доля, затем больше совпадений, затем новые.
+        """
+        matched = Counter()
+        for ingredient in set(ingredient_ids):
+            matched.update(self.postings.get(ingredient, ()))
+        found = []
+        for recipe_id, count in matched.items():
+            ingredients = self.recipes.get(recipe_id)
+            if ingredients:
+                found.append(
+                    (count / len(ingredients), count, recipe_id,
+                     len(ingredients)))
+        return [
+            (recipe_id, count, total)
+            for _, count, recipe_id, total in nlargest(limit, found)
+        ]
+
+
+def load_rows(recipe_ids=None):
+    rows = IngredientToRecipe.objects.order_by('recipe', 'ingredient')
+    if recipe_ids is not None:
+        rows = rows.filter(recipe__in=recipe_ids)
+    return rows.values_list('recipe', 'ingredient').iterator(
+        chunk_size=10000)
+
+
+class CoverageIndexHolder:
+    """
+    Индекс собирается при первом обращении, затем дополняется по
+    журналу изменений в кэше. Пропущенные записи журнала и кэш в памяти
+    процесса покрываются полной пересборкой раз в COVERAGE_INDEX_TTL.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.sequence = 0
+        self.built_at = 0.0
+
+    def is_expired(self, sequence):
+        return (
+            self.index is None
+            or sequence < self.sequence
+            or sequence - self.sequence > settings.COVERAGE_JOURNAL_SIZE
+            or time.monotonic() - self.built_at
+            > settings.COVERAGE_INDEX_TTL
+        )
+
+    def get(self):
+        sequence = get_sequence()
+        if sequence == self.sequence and not self.is_expired(sequence):
+            return self.index
+        with self.lock:
+            if self.is_expired(sequence):
+                self.index = CoverageIndex(load_rows())
+                self.sequence = sequence
+                self.built_at = time.monotonic()
+            elif sequence > self.sequence:
+                self.apply_changes(sequence)
+            return self.index
+
+    def apply_changes(self, sequence):
+        """
+        Применяет журнал до первой отсутствующей записи: ее могли
+        еще не успеть записать, поэтому она читается в следующий раз.
+        """
+        numbers = range(self.sequence + 1, sequence + 1)
+        changes = cache.get_many([_change_key(number) for number in numbers])
+        recipe_ids = set()
+        for number in numbers:
+            recipe_id = changes.get(_change_key(number))
+            if recipe_id is None:
+                break
+            recipe_ids.add(recipe_id)
+            self.sequence = number
+        if recipe_ids:
+            self.index.update(recipe_ids, load_rows(recipe_ids))
+
+
+get_coverage_index = CoverageIndexHolder().get
@@ -0,0 +1,83 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from users.models import Follow
+
+from .models import Recipe
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def position(pub_date, pk):
+    """
+    Ключ рецепта в ленте. Ключи возрастают вдоль ленты
+    (-pub_date, -id), поэтому ленту можно искать бисекцией.
+    """
+    return -((pub_date - EPOCH) // MICROSECOND), -pk
+
+
+def from_position(key):
+    microseconds, pk = key
+    return EPOCH - microseconds * MICROSECOND, -pk
+
+
+def timeline_key(user_id):
+    return f'feed:{user_id}'
+
+
+def build_timeline(author_ids):
+    return [
+        position(pub_date, pk)
+        for pub_date, pk in Recipe.objects.filter(
+            author__in=author_ids
+        ).order_by('-pub_date', '-id').values_list(
+            'pub_date', 'id'
+        )[:settings.FEED_TIMELINE_SIZE]
+    ]
+
+
+def get_timeline(user_id, author_ids):
+    """
+    Готовая лента из кэша для подписанных на FEED_FANOUT_THRESHOLD
+    и более авторов. Остальным лента собирается запросом по индексу.
+    """
+    if len(author_ids) < settings.FEED_FANOUT_THRESHOLD:
+        return None
+    key = timeline_key(user_id)
+    timeline = cache.get(key)
+    if timeline is None:
+        timeline = build_timeline(author_ids)
+        cache.set(key, timeline, settings.FEED_TIMELINE_TTL)
+    return timeline
+
+
+def drop_timeline(user_id):
+    cache.delete(timeline_key(user_id))
+
+
+def fan_out_recipe(recipe_id):
+    """
+    Задача очереди: новый рецепт добавляется в закэшированные ленты
+    подписчиков автора. Ленты, которых нет в кэше, соберутся при чтении.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).values_list(
+        'author', 'pub_date').first()
+    if recipe is None:
+        return
+    author_id, pub_date = recipe
+    keys = [
+        timeline_key(user_id) for user_id in Follow.objects.filter(
+            author=author_id).values_list('user', flat=True)
+    ]
+    key = position(pub_date, recipe_id)
+    timelines = cache.get_many(keys)
+    for timeline in timelines.values():
+        index = bisect_left(timeline, key)
+        if timeline[index:index + 1] != [key]:
+            timeline.insert(index, key)
+            del timeline[settings.FEED_TIMELINE_SIZE:]
+    if timelines:
+        cache.set_many(timelines, settings.FEED_TIMELINE_TTL)
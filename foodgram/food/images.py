@@ -0,0 +1,126 @@
+import binascii
+import os
+from base64 import b64decode
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .jobs import enqueue
+from .models import Recipe
+
+# Поле модели: наибольшая сторона изображения в пикселях.
+RENDITIONS = {
+    'image_thumbnail': settings.IMAGE_THUMBNAIL_SIZE,
+    'image_detail': settings.IMAGE_DETAIL_SIZE,
+}
+
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'WEBP': 'webp',
+}
+
+
+def encode(image, size):
+    image = image.copy()
+    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    image_format = settings.IMAGE_RENDITION_FORMAT
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        format=image_format,
+        quality=settings.IMAGE_RENDITION_QUALITY,
+        optimize=True,
+    )
+    return buffer.getvalue()
+
+
+def create_renditions(recipe):
+    """
+    Уменьшенные копии изображения рецепта. Оригинал открывается
+    один раз, каждая копия пересжимается в IMAGE_RENDITION_FORMAT.
+    """
+    if not recipe.image:
+        return
+    recipe.image.open('rb')
+    try:
+        with Image.open(recipe.image) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'RGBA'):
+                original = original.convert('RGBA')
+            renditions = {
+                field: encode(original, size)
+                for field, size in RENDITIONS.items()
+            }
+    finally:
+        recipe.image.close()
+    name = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    extension = EXTENSIONS[settings.IMAGE_RENDITION_FORMAT]
+    for field, content in renditions.items():
+        rendition = getattr(recipe, field)
+        if rendition:
+            rendition.delete(save=False)
+        rendition.save(f'{name}.{extension}', ContentFile(content), save=False)
+    recipe.save(update_fields=(*RENDITIONS, 'updated_at'))
+
+
+def schedule_renditions(recipe, upload):
+    """
+    Сохраняет загрузку как есть и ставит ее обработку в очередь:
+    декодирование, проверка и уменьшенные копии делаются в run_jobs.
+    """
+    path = default_storage.save(
+        f'app/uploads/{upload.name}.b64', upload)
+    recipe.image_status = Recipe.IMAGE_PROCESSING
+    recipe.save(update_fields=('image_status', 'updated_at'))
+    enqueue(process_upload, recipe_id=recipe.id, path=path)
+
+
+def process_upload(recipe_id, path):
+    """
+    Задача очереди: base64 из загрузки становится изображением рецепта.
+    Загрузка удаляется, когда повторять обработку уже не нужно.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not default_storage.exists(path):
+        default_storage.delete(path)
+        return
+    with default_storage.open(path, 'rb') as upload:
+        content = upload.read()
+    try:
+        content = b64decode(content)
+        with Image.open(BytesIO(content)) as image:
+            image.verify()
+    except (binascii.Error, OSError, ValueError):
+        recipe.image_status = Recipe.IMAGE_FAILED
+        recipe.save(update_fields=('image_status', 'updated_at'))
+        default_storage.delete(path)
+        return
+    if recipe.image:
+        recipe.image.delete(save=False)
+    name = os.path.splitext(os.path.basename(path))[0]
+    recipe.image.save(name, ContentFile(content), save=False)
+    create_renditions(recipe)
+    recipe.image_status = Recipe.IMAGE_READY
+    recipe.save(update_fields=('image', 'image_status', 'updated_at'))
+    default_storage.delete(path)
+
+
+def upload_failed(recipe_id, path):
+    """
+    Обработка загрузки упала на последней попытке: рецепт не должен
+    навсегда остаться в состоянии processing.
+    """
+    recipe = Recipe.objects.filter(
+        pk=recipe_id, image_status=Recipe.IMAGE_PROCESSING).first()
+    if recipe is not None:
+        recipe.image_status = Recipe.IMAGE_FAILED
+        recipe.save(update_fields=('image_status', 'updated_at'))
+    default_storage.delete(path)
+
+
+process_upload.on_failure = upload_failed
@@ -0,0 +1,94 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .cache import INGREDIENTS, get_version
+from .models import Ingredients
+
+
+def normalize(text):
+    return text.strip().casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """
+    Неизменяемый индекс ингредиентов для поиска по названию.
+
+    Записи отсортированы по нормализованному названию, поэтому
+    совпадения по началу находятся бинарным поиском, а точное
+    совпадение оказывается первым среди них.
+    """
+
+    def __init__(self, ingredients):
+        self.entries = tuple(sorted(
+            (normalize(name), name, pk, measurement_unit)
+            for pk, name, measurement_unit in ingredients
+        ))
+        self.keys = tuple(entry[0] for entry in self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, query, limit=None):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+        query = normalize(query)
+        if not query:
+            return [self.as_dict(entry) for entry in self.entries[:limit]]
+        found = []
+        for position in range(bisect_left(self.keys, query), len(self)):
+            if limit is not None and len(found) >= limit:
+                return found
+            if not self.keys[position].startswith(query):
+                break
+            found.append(self.as_dict(self.entries[position]))
+        for entry in self.entries:
+            if limit is not None and len(found) >= limit:
+                break
+            if entry[0].find(query) > 0:
+                found.append(self.as_dict(entry))
+        return found
+
+    @staticmethod
+    def as_dict(entry):
+        _, name, pk, measurement_unit = entry
+        return {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+
+
+class IndexHolder:
+    """
+    Индекс собирается при первом обращении и пересобирается, когда
+    меняется версия ингредиентов в кэше. С кэшем в памяти процесса
+    версия видна только процессу, изменившему данные, поэтому индекс
+    еще и пересобирается по истечении INGREDIENT_INDEX_TTL секунд.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.version = None
+        self.built_at = 0.0
+
+    def is_fresh(self, version):
+        return (
+            self.index is not None
+            and self.version == version
+            and time.monotonic() - self.built_at
+            < settings.INGREDIENT_INDEX_TTL
+        )
+
+    def get(self):
+        version = get_version(INGREDIENTS)
+        if self.is_fresh(version):
+            return self.index
+        with self.lock:
+            if not self.is_fresh(version):
+                self.index = IngredientIndex(Ingredients.objects.values_list(
+                    'id', 'name', 'measurement_unit'))
+                self.version = version
+                self.built_at = time.monotonic()
+            return self.index
+
+
+get_index = IndexHolder().get
@@ -0,0 +1,108 @@
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def give_up(task, kwargs):
+    """
+    Задача больше не повторяется: вызывается ее on_failure, если он
+    есть, чтобы данные не остались в промежуточном состоянии.
+    """
+    try:
+        on_failure = getattr(import_string(task), 'on_failure', None)
+        if on_failure is not None:
+            on_failure(**kwargs)
+    except Exception:
+        logger.exception('Отказ задачи %s не обработан', task)
+
+
+class DatabaseBackend:
+    """
+    Задачи пишутся в таблицу Job в той же транзакции, что и данные,
+    и выполняются командой run_jobs.
+    """
+
+    def enqueue(self, task, kwargs):
+        Job.objects.create(task=task, payload=json.dumps(kwargs))
+
+
+class ImmediateBackend:
+    """Задача выполняется в текущем процессе после коммита транзакции."""
+
+    def enqueue(self, task, kwargs):
+        transaction.on_commit(lambda: self.run(task, kwargs))
+
+    def run(self, task, kwargs):
+        try:
+            import_string(task)(**kwargs)
+        except Exception:
+            give_up(task, kwargs)
+            raise
+
+
+def get_backend():
+    return import_string(settings.JOB_QUEUE_BACKEND)()
+
+
+def enqueue(func, **kwargs):
+    """
+    Ставит функцию в очередь. Аргументы должны сериализоваться в JSON,
+    задача ищется по полному имени функции.
+    """
+    get_backend().enqueue(f'{func.__module__}.{func.__qualname__}', kwargs)
+
+
+def claim_job():
+    """
+    Забирает первую готовую задачу. Задачи, зависшие в состоянии
+    running дольше JOB_TIMEOUT секунд, считаются потерянными.
+    """
+    now = timezone.now()
+    lost = now - timedelta(seconds=settings.JOB_TIMEOUT)
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            Q(status=Job.PENDING, run_after__lte=now)
+            | Q(status=Job.RUNNING, started__lt=lost)
+        ).order_by('run_after', 'id').first()
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.started = now
+        job.save(update_fields=('status', 'attempts', 'started'))
+    return job
+
+
+def run_job(job):
+    """
+    Выполненная задача удаляется. Упавшая повторяется с растущей
+    задержкой, после JOB_MAX_ATTEMPTS попыток остается в состоянии failed
+    и вызывается ее on_failure.
+    """
+    try:
+        import_string(job.task)(**json.loads(job.payload))
+    except Exception:
+        logger.exception('Задача %s #%s завершилась ошибкой', job.task, job.id)
+        job.error = traceback.format_exc()
+        if job.attempts < settings.JOB_MAX_ATTEMPTS:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = Job.FAILED
+            give_up(job.task, json.loads(job.payload))
+        job.save(update_fields=('status', 'error', 'run_after'))
+        return False
+    job.delete()
+    return True
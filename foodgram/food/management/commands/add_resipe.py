@@ -1,34 +1,92 @@
 import csv
+import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from food.cache import INGREDIENTS, bump_version
 from food.models import Ingredients
 
 DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
 
 
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            name, measurement_unit = row
+            yield name, measurement_unit
+
+
+def read_json(file):
+    for item in json.load(file):
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
 class Command(BaseCommand):
     """
-    Переносим данные из csv в базу данных
+    Переносим данные из csv или json в базу данных
     """
-    help = 'Добавляем ингредиенты из файла ingredients.csv'
+    help = 'Добавляем ингредиенты из файла ingredients.csv или .json'
 
     def add_arguments(self, parser):
         parser.add_argument('filename', default='ingredients.csv', nargs='?',
                             type=str)
+        parser.add_argument('--batch-size', default=1000, type=int)
 
     def handle(self, *args, **options):
+        filename = options['filename']
+        reader = READERS.get(os.path.splitext(filename)[1].lower())
+        if reader is None:
+            raise CommandError(u'Поддерживаются только файлы .csv и .json')
+        started = time.monotonic()
         try:
-            with open(os.path.join(DATA_ROOT, options['filename']), 'r',
+            with open(os.path.join(DATA_ROOT, filename), 'r',
                       encoding='utf-8') as f:
-                data = csv.reader(f)
-                for row in data:
-                    name, measurement_unit = row
-                    Ingredients.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
+                inserted, skipped = self.load(
+                    reader(f), options['batch_size'])
         except FileNotFoundError:
-            raise CommandError(u'Добавьте файл ingredients.'
-                               u'csv в директорию backend/data')
+            raise CommandError(
+                f'Добавьте файл {filename} в директорию {DATA_ROOT}')
+        bump_version(INGREDIENTS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {inserted}, пропущено: {skipped}, '
+            f'время: {time.monotonic() - started:.2f} с'
+        ))
+
+    @staticmethod
+    def load(rows, batch_size):
+        seen = set(Ingredients.objects.values_list(
+            'name', 'measurement_unit'))
+        total = 0
+
+        def new_ingredients():
+            nonlocal total
+            for row in rows:
+                total += 1
+                if row in seen:
+                    continue
+                seen.add(row)
+                name, measurement_unit = row
+                yield Ingredients(
+                    name=name, measurement_unit=measurement_unit)
+
+        ingredients = new_ingredients()
+        with transaction.atomic():
+            before = Ingredients.objects.count()
+            while True:
+                batch = list(islice(ingredients, batch_size))
+                if not batch:
+                    break
+                Ingredients.objects.bulk_create(
+                    batch, ignore_conflicts=True)
+            inserted = Ingredients.objects.count() - before
+        return inserted, total - inserted
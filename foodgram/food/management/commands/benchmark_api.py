@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from food.benchmark import compare, dump, run
+from food.synthetic import PREFIX
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Замеряем время ответа и число SQL-запросов основных эндпоинтов
+    """
+    help = 'Прогоняем эндпоинты API и выводим p50/p95 и число запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', default=50, type=int)
+        parser.add_argument('--warmup', default=5, type=int)
+        parser.add_argument('--username', default=f'{PREFIX}0',
+                            help='Пользователь, от имени которого '
+                                 'идут запросы')
+        parser.add_argument('--only', nargs='*',
+                            help='Запустить только эти сценарии')
+        parser.add_argument('--output', help='Сохранить отчет в файл')
+        parser.add_argument('--compare',
+                            help='Сравнить с отчетом прошлого прогона')
+        parser.add_argument('--tolerance', default=20, type=float,
+                            help='Допустимый рост p95, в процентах')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(
+                'Пользователь не найден, сначала выполните '
+                'generate_synthetic_data')
+        report = run(
+            user, options['iterations'], options['warmup'], options['only'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(dump(report))
+        self.stdout.write(dump(report))
+        if not options['compare']:
+            return
+        with open(options['compare'], 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, options['tolerance'])
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'Найдено регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
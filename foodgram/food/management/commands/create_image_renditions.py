@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from food.images import create_renditions
+from food.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Создаем уменьшенные копии изображений уже загруженных рецептов
+    """
+    help = 'Создаем превью и изображения для страницы рецепта'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Пересоздать копии для всех рецептов')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['force']:
+            recipes = recipes.filter(
+                Q(image_thumbnail='') | Q(image_detail=''))
+        created = failed = 0
+        for recipe in recipes.iterator():
+            try:
+                create_renditions(recipe)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe.id}: {error}')
+            else:
+                created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано: {created}, с ошибками: {failed}'
+        ))
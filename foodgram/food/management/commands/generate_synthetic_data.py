@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from food.synthetic import clear, generate
+
+
+class Command(BaseCommand):
+    """
+    Заполняем базу синтетическими данными для замеров производительности
+    """
+    help = 'Создаем синтетических пользователей, рецепты и активность'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=1000, type=int)
+        parser.add_argument('--recipes', default=10000, type=int)
+        parser.add_argument('--tags', default=20, type=int)
+        parser.add_argument('--ingredients', default=2000, type=int)
+        parser.add_argument('--ingredients-per-recipe', default=8, type=int)
+        parser.add_argument('--favorites', default=50000, type=int)
+        parser.add_argument('--carts', default=10000, type=int)
+        parser.add_argument('--follows', default=20000, type=int)
+        parser.add_argument('--skew', default=1.0, type=float,
+                            help='Показатель распределения Ципфа')
+        parser.add_argument('--seed', default=0, type=int)
+        parser.add_argument('--batch-size', default=1000, type=int)
+        parser.add_argument('--clear', action='store_true',
+                            help='Только удалить синтетические данные')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear()
+            self.stdout.write(self.style.SUCCESS(
+                'Синтетические данные удалены'))
+            return
+        started = time.monotonic()
+        created = generate(
+            users=options['users'],
+            recipes=options['recipes'],
+            tags=options['tags'],
+            ingredients=options['ingredients'],
+            ingredients_per_recipe=options['ingredients_per_recipe'],
+            favorites=options['favorites'],
+            carts=options['carts'],
+            follows=options['follows'],
+            skew=options['skew'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        summary = ', '.join(f'{name}: {count}' for name, count
+                            in created.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {summary}, '
+            f'время: {time.monotonic() - started:.2f} с'
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from food.ranking import rank_recipes
+
+
+class Command(BaseCommand):
+    """
+    Пересчитываем популярность рецептов для сортировки ordering=popular
+    """
+    help = 'Пересчитываем оценки популярности рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', default=1000, type=int)
+        parser.add_argument('--every', default=0, type=int,
+                            help='Повторять каждые N секунд')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            ranked = rank_recipes(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Оценено рецептов: {ranked}, '
+                f'время: {time.monotonic() - started:.2f} с'
+            ))
+            if options['every'] <= 0:
+                return
+            time.sleep(options['every'])
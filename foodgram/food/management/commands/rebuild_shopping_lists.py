@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from food.shopping_list import find_inconsistencies, refresh_shopping_lists
+
+
+class Command(BaseCommand):
+    """
+    Пересобираем списки покупок из корзин пользователей
+    """
+    help = 'Пересчитываем списки покупок всех пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить списки, не изменяя их')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            refresh_shopping_lists()
+            self.stdout.write(self.style.SUCCESS('Списки покупок пересобраны'))
+            return
+        errors = find_inconsistencies()
+        for (user_id, ingredient_id), stored, expected in errors:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'{stored} вместо {expected}'
+            )
+        if errors:
+            raise CommandError(f'Найдено расхождений: {len(errors)}')
+        self.stdout.write(self.style.SUCCESS('Списки покупок согласованы'))
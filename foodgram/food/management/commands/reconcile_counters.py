@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from food.counters import find_drift, reconcile_counters
+
+
+class Command(BaseCommand):
+    """
+    Сверяем счетчики избранного, корзин, рецептов и подписчиков
+    """
+    help = 'Пересчитываем разошедшиеся счетчики рецептов и пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить счетчики, не изменяя их')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            fixed = reconcile_counters()
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено счетчиков: {fixed}'))
+            return
+        errors = list(find_drift())
+        for model, field, pk, stored, actual in errors:
+            self.stdout.write(
+                f'{model._meta.model_name}={pk} {field}: '
+                f'{stored} вместо {actual}'
+            )
+        if errors:
+            raise CommandError(f'Найдено расхождений: {len(errors)}')
+        self.stdout.write(self.style.SUCCESS('Счетчики согласованы'))
@@ -0,0 +1,62 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from food.jobs import claim_job, run_job
+
+
+class Command(BaseCommand):
+    """
+    Обработчик фоновых задач из таблицы Job
+    """
+    help = 'Выполняем фоновые задачи: обработку изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default=1, type=int,
+                            help='Количество потоков-обработчиков')
+        parser.add_argument('--sleep', default=1.0, type=float,
+                            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument('--once', action='store_true',
+                            help='Выйти, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        self.stopped = threading.Event()
+        self.done = self.failed = 0
+        self.lock = threading.Lock()
+        workers = [
+            threading.Thread(
+                target=self.work, args=(options['sleep'], options['once']),
+                daemon=True)
+            for _ in range(max(options['workers'], 1))
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(1)
+        except KeyboardInterrupt:
+            self.stopped.set()
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено: {self.done}, с ошибками: {self.failed}'
+        ))
+
+    def work(self, sleep, once):
+        try:
+            while not self.stopped.is_set():
+                job = claim_job()
+                if job is None:
+                    if once:
+                        return
+                    self.stopped.wait(sleep)
+                    continue
+                succeeded = run_job(job)
+                with self.lock:
+                    if succeeded:
+                        self.done += 1
+                    else:
+                        self.failed += 1
+        finally:
+            connection.close()
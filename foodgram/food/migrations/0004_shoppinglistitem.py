@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_shopping_lists(apps, schema_editor):
+    IngredientToRecipe = apps.get_model('food', 'IngredientToRecipe')
+    ShoppingListItem = apps.get_model('food', 'ShoppingListItem')
+    totals = IngredientToRecipe.objects.filter(
+        recipe__shopping_list__isnull=False
+    ).values(
+        'recipe__shopping_list__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row['recipe__shopping_list__user'],
+            ingredient_id=row['ingredient'],
+            amount=row['total'],
+        )
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('food', '0003_auto_20230403_2003'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='food.Ingredients', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в списке покупок',
+                'verbose_name_plural': 'Ингредиенты в списке покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='user_shopping_item_unique'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
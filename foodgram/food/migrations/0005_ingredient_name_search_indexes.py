@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-17 09:10
+
+from django.db import migrations
+
+# Django ищет istartswith/icontains через UPPER(name) LIKE UPPER(%s),
+# поэтому индексы строятся по выражению, а не по самому полю.
+CREATE_INDEXES = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS food_ingredients_name_upper_like '
+    'ON food_ingredients (UPPER(name) varchar_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS food_ingredients_name_upper_trgm '
+    'ON food_ingredients USING gin (UPPER(name) gin_trgm_ops)',
+)
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS food_ingredients_name_upper_trgm',
+    'DROP INDEX IF EXISTS food_ingredients_name_upper_like',
+)
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0004_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(CREATE_INDEXES),
+            run_on_postgresql(DROP_INDEXES),
+        ),
+    ]
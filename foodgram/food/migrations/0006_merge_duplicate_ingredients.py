@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-17 10:05
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredients = apps.get_model('food', 'Ingredients')
+    IngredientToRecipe = apps.get_model('food', 'IngredientToRecipe')
+    ShoppingListItem = apps.get_model('food', 'ShoppingListItem')
+    groups = Ingredients.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep=Min('id'), total=Count('id')).filter(
+        total__gt=1).order_by()
+    for group in groups:
+        duplicates = Ingredients.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit'],
+        ).exclude(id=group['keep'])
+        IngredientToRecipe.objects.filter(
+            ingredient__in=duplicates).update(ingredient_id=group['keep'])
+        ShoppingListItem.objects.filter(
+            ingredient__in=[group['keep'], *duplicates.values_list(
+                'id', flat=True)]).delete()
+        totals = IngredientToRecipe.objects.filter(
+            ingredient=group['keep'], recipe__shopping_list__isnull=False
+        ).values('recipe__shopping_list__user').annotate(
+            total=Sum('amount')).order_by()
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=row['recipe__shopping_list__user'],
+                ingredient_id=group['keep'],
+                amount=row['total'],
+            )
+            for row in totals
+        )
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0005_ingredient_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+    ]
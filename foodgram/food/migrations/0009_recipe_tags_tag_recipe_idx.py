@@ -0,0 +1,22 @@
+# Generated by Django 2.2.16 on 2026-10-17 12:00
+
+from django.db import migrations
+
+# Промежуточная таблица тегов создается автоматически и не имеет Meta,
+# поэтому составной индекс для отбора рецептов по тегу создается SQL.
+# Уникальный индекс (recipe_id, tag_id) для этого не подходит.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0008_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX food_recipe_tags_tag_recipe_idx '
+            'ON food_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX food_recipe_tags_tag_recipe_idx',
+        ),
+    ]
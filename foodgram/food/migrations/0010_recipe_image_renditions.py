@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0009_recipe_tags_tag_recipe_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_detail',
+            field=models.ImageField(blank=True, upload_to='app/detail/', verbose_name='Изображение для страницы рецепта'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, upload_to='app/thumbnails/', verbose_name='Превью изображения'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-17 15:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('food', 'Recipe')
+    for field, related in (
+        ('favorites_count', apps.get_model('food', 'Favorite')),
+        ('in_carts_count', apps.get_model('food', 'ShoppingCart')),
+    ):
+        Recipe.objects.update(**{field: Coalesce(Subquery(
+            related.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                total=Count('pk')).values('total')
+        ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0011_job_recipe_image_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
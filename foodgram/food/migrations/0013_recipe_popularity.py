@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-17 16:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0012_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Добавлен'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Добавлен'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-popularity', '-id'], name='recipe_popularity_id_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-17 18:00
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Вектор собирается так же, как food.search.search_document.
+FILL_VECTORS = """
+    UPDATE food_recipe SET search_vector =
+        setweight(to_tsvector('russian', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(i.name, ' ')
+            FROM food_ingredienttorecipe ir
+            JOIN food_ingredients i ON i.id = ir.ingredient_id
+            WHERE ir.recipe_id = food_recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('russian', coalesce(text, '')), 'C')
+"""
+CREATE_INDEXES = (
+    FILL_VECTORS,
+    'CREATE INDEX IF NOT EXISTS food_recipe_search_vector_gin '
+    'ON food_recipe USING gin (search_vector)',
+)
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS food_recipe_search_vector_gin',
+)
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0014_recipe_author_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            run_on_postgresql(CREATE_INDEXES),
+            run_on_postgresql(DROP_INDEXES),
+        ),
+    ]
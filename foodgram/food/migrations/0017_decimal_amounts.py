@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-17 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0016_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredienttorecipe',
+            name='amount',
+            field=models.DecimalField(decimal_places=3, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='shoppinglistitem',
+            name='amount',
+            field=models.DecimalField(decimal_places=3, max_digits=14, verbose_name='Количество'),
+        ),
+    ]
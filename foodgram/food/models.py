@@ -1,7 +1,9 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.db.models import UniqueConstraint
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -38,6 +40,12 @@ class Ingredients(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = [
+            UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_unit'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -45,6 +53,15 @@ class Ingredients(models.Model):
 
 class Recipe(models.Model):
     """ Model about recipe. """
+    IMAGE_READY = 'ready'
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUSES = (
+        (IMAGE_READY, 'Готово'),
+        (IMAGE_PROCESSING, 'Обрабатывается'),
+        (IMAGE_FAILED, 'Ошибка обработки'),
+    )
+
     tags = models.ManyToManyField(
         Tag,
         related_name='recipes',
@@ -70,6 +87,22 @@ class Recipe(models.Model):
         verbose_name='Изображение',
         upload_to='app/',
     )
+    image_thumbnail = models.ImageField(
+        verbose_name='Превью изображения',
+        upload_to='app/thumbnails/',
+        blank=True,
+    )
+    image_detail = models.ImageField(
+        verbose_name='Изображение для страницы рецепта',
+        upload_to='app/detail/',
+        blank=True,
+    )
+    image_status = models.CharField(
+        verbose_name='Состояние изображения',
+        max_length=16,
+        choices=IMAGE_STATUSES,
+        default=IMAGE_READY,
+    )
     text = models.TextField(
         verbose_name='Текст'
     )
@@ -82,6 +115,29 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации', auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения', auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
+    popularity = models.FloatField(
+        verbose_name='Популярность',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = ("Рецепты")
@@ -91,6 +147,20 @@ class Recipe(models.Model):
                 name='unique_recipe_to_author'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('-popularity', '-id'),
+                name='recipe_popularity_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
         ordering = ['-pub_date']
 
     def __str__(self):
@@ -101,11 +171,22 @@ class IngredientToRecipe(models.Model):
     """ Model wish unit and quantity ingrediens. """
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
     ingredient = models.ForeignKey(Ingredients, on_delete=models.CASCADE)
-    amount = models.PositiveSmallIntegerField()
+    amount = models.DecimalField(max_digits=10, decimal_places=3)
 
     def __str__(self):
         return (f'{self.ingredient} для {self.recipe}')
 
+    def delete(self, *args, **kwargs):
+        """
+        У модели нет сигналов удаления, чтобы каскад и QuerySet.delete()
+        шли одним DELETE. Удаление одной строки обрабатывается здесь.
+        """
+        from .signals import ingredients_changed
+        result = super().delete(*args, **kwargs)
+        if result[0]:
+            ingredients_changed((self.recipe_id,))
+        return result
+
 
 class Favorite(models.Model):
     """ Favorite recipe. """
@@ -121,6 +202,11 @@ class Favorite(models.Model):
         verbose_name='Рецепт',
         related_name='favorites',
     )
+    created = models.DateTimeField(
+        verbose_name='Добавлен',
+        default=timezone.now,
+        db_index=True,
+    )
 
     class Meta:
         constraints = [
@@ -151,6 +237,11 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
         related_name='shopping_list',
     )
+    created = models.DateTimeField(
+        verbose_name='Добавлен',
+        default=timezone.now,
+        db_index=True,
+    )
 
     class Meta:
         constraints = [
@@ -165,3 +256,94 @@ class ShoppingCart(models.Model):
     def __str__(self):
         return (f'Рецепт {self.recipe.name} в списке покупок',
                 f' пользователя: {self.user.get_username}')
+
+
+class ShoppingListItem(models.Model):
+    """ Summed amount of ingredient in user shop list. """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list_items',
+    )
+    ingredient = models.ForeignKey(
+        Ingredients,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+        related_name='shopping_list_items',
+    )
+    amount = models.DecimalField(
+        verbose_name='Количество',
+        max_digits=14,
+        decimal_places=3,
+    )
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='user_shopping_item_unique'
+            )
+        ]
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+
+    def __str__(self):
+        return f'{self.ingredient} ({self.amount}) для {self.user}'
+
+
+class Job(models.Model):
+    """ Background task stored in the database queue. """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    task = models.CharField(
+        verbose_name='Задача',
+        max_length=200,
+    )
+    payload = models.TextField(
+        verbose_name='Аргументы',
+        default='{}',
+    )
+    status = models.CharField(
+        verbose_name='Состояние',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0,
+    )
+    error = models.TextField(
+        verbose_name='Ошибка',
+        blank=True,
+    )
+    run_after = models.DateTimeField(
+        verbose_name='Не раньше',
+        default=timezone.now,
+    )
+    started = models.DateTimeField(
+        verbose_name='Начало выполнения',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=('status', 'run_after'),
+                name='job_status_run_after_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.task} ({self.get_status_display()})'
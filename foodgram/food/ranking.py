@@ -0,0 +1,55 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .cache import POPULARITY, bump_version
+from .models import Favorite, Recipe, ShoppingCart
+
+# Вес одного добавления в оценке популярности рецепта.
+WEIGHTS = (
+    (Favorite, 1.0),
+    (ShoppingCart, 0.5),
+)
+
+
+def activity_scores(now=None):
+    """
+    Оценки рецептов по добавлениям за POPULARITY_WINDOW дней. База
+    считает добавления по дням, а вес дня уменьшается вдвое каждые
+    POPULARITY_HALF_LIFE дней.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    since = now - timedelta(days=settings.POPULARITY_WINDOW)
+    scores = defaultdict(float)
+    for model, weight in WEIGHTS:
+        days = model.objects.filter(created__gte=since).annotate(
+            day=TruncDate('created')
+        ).values('recipe', 'day').annotate(total=Count('pk')).order_by()
+        for row in days:
+            age = (today - row['day']).days
+            scores[row['recipe']] += weight * row['total'] * 0.5 ** (
+                age / settings.POPULARITY_HALF_LIFE)
+    return scores
+
+
+def rank_recipes(batch_size=1000):
+    """
+    Записывает оценки в Recipe.popularity, у рецептов без активности
+    оценка обнуляется. Возвращает число рецептов с ненулевой оценкой.
+    """
+    scores = activity_scores()
+    with transaction.atomic():
+        Recipe.objects.filter(popularity__gt=0).update(popularity=0)
+        Recipe.objects.bulk_update(
+            [Recipe(pk=pk, popularity=score) for pk, score in scores.items()],
+            ('popularity',),
+            batch_size=batch_size,
+        )
+    bump_version(POPULARITY)
+    return len(scores)
@@ -0,0 +1,88 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import (Case, F, Func, IntegerField, OuterRef, Q,
+                              Subquery, TextField, Value, When)
+
+from .models import IngredientToRecipe, Recipe
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+class Headline(Func):
+    """ts_headline: фрагмент текста с выделенными совпадениями."""
+    function = 'ts_headline'
+    output_field = TextField()
+
+
+def search_document():
+    """
+    Вектор рецепта: название весит больше ингредиентов,
+    ингредиенты - больше описания.
+    """
+    from django.contrib.postgres.aggregates import StringAgg
+
+    ingredients = Subquery(
+        IngredientToRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    config = settings.SEARCH_CONFIG
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(ingredients, weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    )
+
+
+def update_search_vectors(recipes):
+    """Пересчитывает вектор одним UPDATE, recipes - id или queryset."""
+    if not is_supported():
+        return
+    Recipe.objects.filter(pk__in=recipes).update(
+        search_vector=search_document())
+
+
+def search_recipes(queryset, text):
+    """
+    Полнотекстовый поиск с сортировкой по рангу. Без PostgreSQL -
+    поиск подстроки в названии, описании и ингредиентах.
+    """
+    if not is_supported():
+        return queryset.filter(
+            id__in=Recipe.objects.filter(
+                Q(name__icontains=text)
+                | Q(text__icontains=text)
+                | Q(ingredients__name__icontains=text)
+            ).values('id')
+        ).annotate(
+            search_rank=Case(
+                When(name__icontains=text, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('search_rank', '-pub_date', '-id')
+    query = SearchQuery(text, config=settings.SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(F('search_vector'), query),
+        search_headline=Headline(
+            Value(settings.SEARCH_CONFIG), F('text'), query),
+    ).order_by('-search_rank', '-pub_date', '-id')
+
+
+def highlight(text, query):
+    """Выделение совпадений без PostgreSQL, как делает ts_headline."""
+    words = [re.escape(word) for word in query.split()]
+    if not words:
+        return None
+    return re.sub(
+        '|'.join(words), lambda match: f'<b>{match.group(0)}</b>',
+        text, flags=re.IGNORECASE,
+    )
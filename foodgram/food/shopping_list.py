@@ -0,0 +1,121 @@
+from django.db import transaction
+from django.db.models import Sum
+from users.models import User
+
+from .models import IngredientToRecipe, ShoppingCart, ShoppingListItem
+from .units import CONVERSIONS, present
+
+
+def _aggregate(user_ids=None, ingredient_ids=None):
+    """Суммы ингредиентов по корзинам пользователей."""
+    lookups = {'recipe__shopping_list__isnull': False}
+    if user_ids is not None:
+        lookups['recipe__shopping_list__user__in'] = user_ids
+    if ingredient_ids is not None:
+        lookups['ingredient__in'] = ingredient_ids
+    return IngredientToRecipe.objects.filter(**lookups).values(
+        'recipe__shopping_list__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
+
+
+def refresh_shopping_lists(user_ids=None, ingredient_ids=None):
+    """
+    Пересчитываем список покупок из корзин.
+
+    Пересчитываются только переданные пользователи и ингредиенты,
+    None означает всех. Строки пользователей блокируются до конца
+    транзакции, чтобы два пересчета одного списка не пересеклись
+    между удалением и вставкой.
+    """
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        items = items.filter(user__in=user_ids)
+    if ingredient_ids is not None:
+        ingredient_ids = list(ingredient_ids)
+        if not ingredient_ids:
+            return
+        items = items.filter(ingredient__in=ingredient_ids)
+    users = User.objects.order_by('pk')
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    with transaction.atomic():
+        list(users.select_for_update().values_list('pk', flat=True))
+        totals = _aggregate(user_ids, ingredient_ids)
+        items.delete()
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=row['recipe__shopping_list__user'],
+                ingredient_id=row['ingredient'],
+                amount=row['total'],
+            )
+            for row in totals
+        )
+
+
+def refresh_cart_recipe(user_id, recipe_id):
+    """Рецепт добавлен в корзину или удален из нее."""
+    refresh_shopping_lists(
+        [user_id],
+        IngredientToRecipe.objects.filter(
+            recipe=recipe_id).values_list('ingredient', flat=True),
+    )
+
+
+def refresh_recipe(recipe_id):
+    """Изменились ингредиенты рецепта."""
+    refresh_shopping_lists(
+        ShoppingCart.objects.filter(
+            recipe=recipe_id).values_list('user', flat=True)
+    )
+
+
+def merged_items(user):
+    """
+    Список покупок для вывода. Строки читаются одним запросом и за
+    один проход переводятся в базовые единицы: продукт с одним
+    названием в совместимых единицах складывается, 500 г и 1 кг
+    муки дают 1.5 кг.
+    """
+    totals = {}
+    for name, unit, amount in ShoppingListItem.objects.filter(
+        user=user
+    ).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ).order_by().iterator():
+        base, factor = CONVERSIONS.get(unit, (unit, 1))
+        key = (name.strip().lower(), base)
+        line = totals.get(key)
+        if line is None:
+            totals[key] = [name, {unit}, amount * factor]
+        else:
+            line[1].add(unit)
+            line[2] += amount * factor
+    for (_, base), (name, units, total) in sorted(totals.items()):
+        measurement_unit, amount = present(base, total, units)
+        yield {
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount,
+        }
+
+
+def find_inconsistencies():
+    """Расхождения между списками покупок и корзинами."""
+    expected = {
+        (row['recipe__shopping_list__user'], row['ingredient']): row['total']
+        for row in _aggregate()
+    }
+    stored = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount
+        in ShoppingListItem.objects.values_list(
+            'user', 'ingredient', 'amount')
+    }
+    return sorted(
+        (key, stored.get(key), expected.get(key))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key) != expected.get(key)
+    )
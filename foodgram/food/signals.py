@@ -0,0 +1,191 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save, pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+from users.models import Follow, User
+
+from .cache import (INGREDIENTS, TAGS, author_namespace, bump_on_commit,
+                    recipe_namespaces, tag_namespace)
+from .counters import change_counter, reconcile_counters, signal_delta
+from .coverage_index import record_change
+from .feed import drop_timeline, fan_out_recipe
+from .jobs import enqueue
+from .models import (Favorite, Ingredients, IngredientToRecipe, Recipe,
+                     ShoppingCart, Tag)
+from .search import update_search_vectors
+from .shopping_list import (refresh_cart_recipe, refresh_recipe,
+                            refresh_shopping_lists)
+
+
+def _touch(recipes):
+    """Тела рецептов кэшируются по updated_at, его меняют и связи."""
+    Recipe.objects.filter(pk__in=recipes).update(updated_at=timezone.now())
+
+
+def ingredients_changed(recipes):
+    """
+    Ингредиенты рецептов изменились: списки покупок, поиск, индекс
+    покрытия и кэш ответов. Строки IngredientToRecipe удаляются
+    без сигналов, вызывающий код обрабатывает их сам.
+    """
+    recipes = list(recipes)
+    for recipe_id in recipes:
+        refresh_recipe(recipe_id)
+        record_change(recipe_id)
+    update_search_vectors(recipes)
+    _touch(recipes)
+    bump_on_commit(recipe_namespaces(recipes))
+
+
+def _count(model, pk, field, signal_kwargs):
+    delta = signal_delta(**signal_kwargs)
+    if delta:
+        change_counter(model, pk, field, delta)
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    refresh_cart_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=IngredientToRecipe)
+def recipe_ingredient_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ingredients_changed((instance.recipe_id,))
+
+
+@receiver((post_save, post_delete), sender=Ingredients)
+def ingredient_changed(sender, **kwargs):
+    bump_on_commit((INGREDIENTS,))
+
+
+@receiver(pre_delete, sender=Ingredients)
+def ingredient_deleting(sender, instance, **kwargs):
+    instance.recipe_ids = list(IngredientToRecipe.objects.filter(
+        ingredient=instance).values_list('recipe', flat=True))
+
+
+@receiver(post_delete, sender=Ingredients)
+def ingredient_deleted(sender, instance, **kwargs):
+    ingredients_changed(getattr(instance, 'recipe_ids', ()))
+
+
+@receiver(post_save, sender=Ingredients)
+def ingredient_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_search_vectors(
+            IngredientToRecipe.objects.filter(
+                ingredient=instance).values('recipe'))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or update_fields and not {'name', 'text'} & set(update_fields):
+        return
+    update_search_vectors((instance.id,))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_on_commit((TAGS,))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def favorite_counted(sender, instance, **kwargs):
+    _count(Recipe, instance.recipe_id, 'favorites_count', kwargs)
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def shopping_cart_counted(sender, instance, **kwargs):
+    _count(Recipe, instance.recipe_id, 'in_carts_count', kwargs)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_counted(sender, instance, **kwargs):
+    _count(User, instance.author_id, 'recipes_count', kwargs)
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def follow_counted(sender, instance, **kwargs):
+    _count(User, instance.author_id, 'followers_count', kwargs)
+
+
+@receiver(post_migrate)
+def counters_migrated(sender, plan=None, **kwargs):
+    """
+    Счетчики пользователей добавляет миграция users, которая создается
+    при деплое, поэтому заполняются после каждого migrate с миграциями.
+    """
+    if sender.name == 'food' and plan:
+        reconcile_counters()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue(fan_out_recipe, recipe_id=instance.id)
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    drop_timeline(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(pre_delete, sender=Recipe)
+def recipe_response_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_on_commit(recipe_namespaces((instance.id,)))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    """
+    Ингредиенты рецепта удаляются каскадом одним DELETE, поэтому
+    рецепт обрабатывается один раз здесь, а не на каждую строку.
+    """
+    instance.cart_user_ids = list(ShoppingCart.objects.filter(
+        recipe=instance).values_list('user', flat=True))
+    record_change(instance.id)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    refresh_shopping_lists(getattr(instance, 'cart_user_ids', ()))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    """
+    Ответы с рецептами до и после изменения: при очистке теги
+    читаются до удаления связей.
+    """
+    if action not in ('pre_clear', 'post_add', 'post_remove'):
+        return
+    if not reverse:
+        _touch((instance.id,))
+        namespaces = recipe_namespaces((instance.id,))
+        namespaces.update(
+            tag_namespace(slug) for slug in Tag.objects.filter(
+                pk__in=pk_set or ()).values_list('slug', flat=True))
+    else:
+        recipes = pk_set or Recipe.objects.filter(
+            tags=instance).values('id')
+        _touch(recipes)
+        namespaces = recipe_namespaces(recipes)
+        namespaces.add(tag_namespace(instance.slug))
+    bump_on_commit(namespaces)
+
+
+@receiver(post_save, sender=User)
+def author_response_changed(sender, instance, created, raw=False,
+                            update_fields=None, **kwargs):
+    """Автор показывается в каждом своем рецепте."""
+    if created or raw or set(update_fields or ()) == {'last_login'}:
+        return
+    recipes = Recipe.objects.filter(author=instance).values('id')
+    _touch(recipes)
+    namespaces = recipe_namespaces(recipes)
+    namespaces.add(author_namespace(instance.id))
+    bump_on_commit(namespaces)
@@ -0,0 +1,301 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+from users.models import Follow, User
+
+from .cache import INGREDIENTS, RECIPES, TAGS, bump_version
+from .counters import reconcile_counters
+from .coverage_index import reset_coverage_index
+from .models import (Favorite, Ingredients, IngredientToRecipe, Recipe,
+                     ShoppingCart, Tag)
+from .ranking import rank_recipes
+from .search import update_search_vectors
+from .shopping_list import refresh_shopping_lists
+
+# Синтетические строки помечаются префиксом, по нему они удаляются.
+PREFIX = 'synthetic'
+PASSWORD = 'synthetic-password'
+IMAGE_NAME = f'app/{PREFIX}.jpg'
+
+WORDS = (
+    'курица', 'говядина', 'рис', 'гречка', 'картофель', 'томаты',
+    'сыр', 'грибы', 'лук', 'чеснок', 'морковь', 'тыква', 'яблоки',
+    'творог', 'паста', 'лосось', 'шпинат', 'фасоль', 'перец', 'сливки',
+)
+DISHES = (
+    'Суп', 'Салат', 'Запеканка', 'Рагу', 'Пирог', 'Паста', 'Каша',
+    'Омлет', 'Плов', 'Гратен',
+)
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+COLORS = ('#E26C2D', '#49B64E', '#8775D2', '#F0C05A', '#4A90D9')
+
+
+def skewed(rng, items, skew):
+    """
+    Выборка с распределением Ципфа: первые элементы выпадают
+    намного чаще, как популярные рецепты и активные пользователи.
+    """
+    weights = list(accumulate(
+        1 / rank ** skew for rank in range(1, len(items) + 1)))
+
+    def sample(count):
+        return rng.choices(items, cum_weights=weights, k=count)
+    return sample
+
+
+def unique_pairs(rng, users, targets, count, skew, exclude_self=False):
+    """До count различных пар (пользователь, объект)."""
+    pick_user, pick_target = skewed(rng, users, skew), skewed(
+        rng, targets, skew)
+    pairs = set()
+    for _ in range(4):
+        missing = count - len(pairs)
+        if missing <= 0:
+            break
+        pairs.update(
+            pair for pair in zip(
+                pick_user(missing),
+                pick_target(missing),
+            )
+            if not exclude_self or pair[0] != pair[1]
+        )
+    return sorted(pairs)
+
+
+def save_image():
+    """Одна картинка на все рецепты, чтобы не раздувать media."""
+    if not default_storage.exists(IMAGE_NAME):
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), COLORS[0]).save(buffer, format='JPEG')
+        default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+    return IMAGE_NAME
+
+
+def clear():
+    """Удаляет синтетические данные, рецепты и связи удаляются каскадом."""
+    User.objects.filter(username__startswith=PREFIX).delete()
+    Tag.objects.filter(slug__startswith=PREFIX).delete()
+    Ingredients.objects.filter(name__startswith=PREFIX).delete()
+
+
+def product_name(number):
+    product = number // len(UNITS)
+    return f'{PREFIX} {WORDS[product % len(WORDS)]} {product}'
+
+
+def limit_batch(model, batch_size):
+    """
+    Явный batch_size в bulk_create Django 2.2 отменяет лимит базы:
+    SQLite не принимает больше 500 строк в одном INSERT.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    return min(batch_size, connection.ops.bulk_batch_size(
+        fields, range(batch_size)))
+
+
+def ensure_ingredients(count, batch_size):
+    """
+    Используются ингредиенты из базы, недостающие создаются.
+    Каждый продукт заводится во всех единицах из UNITS, как
+    дубли из разных источников.
+    """
+    missing = count - Ingredients.objects.count()
+    if missing > 0:
+        Ingredients.objects.bulk_create(
+            (
+                Ingredients(
+                    name=product_name(number),
+                    measurement_unit=UNITS[number % len(UNITS)],
+                )
+                for number in range(missing)
+            ),
+            batch_size=limit_batch(Ingredients, batch_size),
+            ignore_conflicts=True,
+        )
+    return list(Ingredients.objects.order_by('id').values_list(
+        'id', flat=True)[:count])
+
+
+def create_users(count, batch_size):
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        (
+            User(
+                username=f'{PREFIX}{number}',
+                email=f'{PREFIX}{number}@example.com',
+                first_name='Пользователь',
+                last_name=str(number),
+                password=password,
+            )
+            for number in range(count)
+        ),
+        batch_size=limit_batch(User, batch_size),
+    )
+    return list(User.objects.filter(
+        username__startswith=PREFIX).order_by('id').values_list(
+        'id', flat=True))
+
+
+def create_tags(count):
+    Tag.objects.bulk_create(
+        Tag(
+            name=f'{DISHES[number % len(DISHES)]} {number}',
+            color=COLORS[number % len(COLORS)],
+            slug=f'{PREFIX}-{number}',
+        )
+        for number in range(count)
+    )
+    return list(Tag.objects.filter(
+        slug__startswith=PREFIX).order_by('id').values_list(
+        'id', flat=True))
+
+
+def create_recipes(rng, count, authors, skew, batch_size):
+    """
+    Авторы выбираются со смещением, даты публикации разбросаны
+    на год назад. pub_date заполняется при вставке, поэтому даты
+    выставляются вторым проходом.
+    """
+    image = save_image()
+    now = timezone.now()
+    recipe_authors = skewed(rng, authors, skew)(count)
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author_id=author_id,
+                name=f'{rng.choice(DISHES)} {rng.choice(WORDS)} {number}',
+                text=' '.join(rng.choices(WORDS, k=rng.randint(10, 60))),
+                cooking_time=rng.randint(5, 180),
+                image=image,
+                image_thumbnail=image,
+                image_detail=image,
+            )
+            for number, author_id in enumerate(recipe_authors)
+        ),
+        batch_size=limit_batch(Recipe, batch_size),
+    )
+    recipes = list(Recipe.objects.filter(
+        author__username__startswith=PREFIX).order_by('id').values_list(
+        'id', flat=True))
+    dates = sorted(
+        now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        for _ in recipes
+    )
+    Recipe.objects.bulk_update(
+        [
+            Recipe(id=recipe_id, pub_date=pub_date)
+            for recipe_id, pub_date in zip(recipes, dates)
+        ],
+        ['pub_date'],
+        batch_size=batch_size,
+    )
+    # Новые рецепты в начале списка: они популярнее.
+    return recipes[::-1]
+
+
+def create_recipe_links(rng, recipes, tags, ingredients, per_recipe, skew,
+                        batch_size):
+    pick_tags = skewed(rng, tags, skew)
+    pick_ingredients = skewed(rng, ingredients, skew)
+    recipe_tag = Recipe.tags.through
+    recipe_tag.objects.bulk_create(
+        (
+            recipe_tag(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipes
+            for tag_id in set(pick_tags(rng.randint(1, 3)))
+        ),
+        batch_size=limit_batch(recipe_tag, batch_size),
+    )
+    IngredientToRecipe.objects.bulk_create(
+        (
+            IngredientToRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500),
+            )
+            for recipe_id in recipes
+            for ingredient_id in set(pick_ingredients(
+                max(1, int(rng.gauss(per_recipe, per_recipe / 3)))))
+        ),
+        batch_size=limit_batch(IngredientToRecipe, batch_size),
+    )
+
+
+def create_activity(rng, model, users, recipes, count, skew, batch_size):
+    """Избранное и корзины за окно расчета популярности."""
+    now = timezone.now()
+    window = settings.POPULARITY_WINDOW * 24 * 3600
+    model.objects.bulk_create(
+        (
+            model(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                created=now - timedelta(seconds=rng.randint(0, window)),
+            )
+            for user_id, recipe_id in unique_pairs(
+                rng, users, recipes, count, skew)
+        ),
+        batch_size=limit_batch(model, batch_size),
+    )
+
+
+def generate(users, recipes, tags, ingredients, ingredients_per_recipe,
+             favorites, carts, follows, skew=1.0, seed=0, batch_size=1000):
+    """
+    Синтетический набор данных для нагрузочных замеров. С одинаковым
+    seed получается один и тот же набор, прежний при этом удаляется.
+
+    Вставка идет пачками в обход сигналов, поэтому счетчики, списки
+    покупок, популярность и поисковые векторы пересчитываются в конце.
+    """
+    rng = random.Random(seed)
+    with transaction.atomic():
+        clear()
+        ingredient_ids = ensure_ingredients(ingredients, batch_size)
+        user_ids = create_users(users, batch_size)
+        tag_ids = create_tags(tags)
+        recipe_ids = create_recipes(rng, recipes, user_ids, skew, batch_size)
+        create_recipe_links(
+            rng, recipe_ids, tag_ids, ingredient_ids,
+            ingredients_per_recipe, skew, batch_size)
+        create_activity(
+            rng, Favorite, user_ids, recipe_ids, favorites, skew, batch_size)
+        create_activity(
+            rng, ShoppingCart, user_ids, recipe_ids, carts, skew,
+            batch_size)
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in unique_pairs(
+                    rng, user_ids, user_ids, follows, skew,
+                    exclude_self=True)
+            ),
+            batch_size=limit_batch(Follow, batch_size),
+        )
+        refresh_shopping_lists(user_ids)
+        reconcile_counters()
+        update_search_vectors(Recipe.objects.filter(
+            author__username__startswith=PREFIX).values('id'))
+    rank_recipes(batch_size)
+    reset_coverage_index()
+    bump_version(TAGS)
+    bump_version(INGREDIENTS)
+    bump_version(RECIPES)
+    return {
+        'users': len(user_ids),
+        'recipes': len(recipe_ids),
+        'tags': len(tag_ids),
+        'ingredients': len(ingredient_ids),
+    }
@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+GRAM = 'г'
+MILLILITER = 'мл'
+PIECE = 'шт.'
+
+AMOUNT_PLACES = 3
+AMOUNT_STEP = Decimal(1).scaleb(-AMOUNT_PLACES)
+
+# Единица измерения -> (базовая единица, сколько в ней базовых).
+# Масса и объем не складываются между собой: плотность продукта
+# неизвестна. Единицы вне таблицы ("по вкусу", "пучок") остаются
+# как есть и объединяются только с той же единицей.
+CONVERSIONS = {
+    'мг': (GRAM, Decimal('0.001')),
+    'г': (GRAM, Decimal(1)),
+    'кг': (GRAM, Decimal(1000)),
+    'капля': (MILLILITER, Decimal('0.05')),
+    'мл': (MILLILITER, Decimal(1)),
+    'ч. л.': (MILLILITER, Decimal(5)),
+    'ст. л.': (MILLILITER, Decimal(15)),
+    'стакан': (MILLILITER, Decimal(250)),
+    'л': (MILLILITER, Decimal(1000)),
+    'шт.': (PIECE, Decimal(1)),
+    'десяток': (PIECE, Decimal(10)),
+}
+
+# Крупная единица для вывода суммы в базовых единицах.
+DISPLAY_UNITS = {
+    GRAM: ('кг', Decimal(1000)),
+    MILLILITER: ('л', Decimal(1000)),
+}
+
+
+def format_amount(amount):
+    """1000.500 -> '1000.5', без экспоненты и лишних нулей."""
+    return f'{amount.quantize(AMOUNT_STEP).normalize():f}'
+
+
+def present(unit, total, units):
+    """
+    Количество для вывода. Если у продукта была одна единица, она
+    и остается (2 ст. л., а не 30 мл), иначе сумма в базовых
+    единицах переводится в крупную, когда ее набралось на целую.
+    """
+    if len(units) == 1:
+        unit, = units
+        factor = CONVERSIONS.get(unit, (unit, 1))[1]
+        return unit, format_amount(total / factor)
+    if unit in DISPLAY_UNITS:
+        large, factor = DISPLAY_UNITS[unit]
+        if total >= factor:
+            return large, format_amount(total / factor)
+    return unit, format_amount(total)
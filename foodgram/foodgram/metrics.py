@@ -0,0 +1,239 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from heapq import nlargest
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# Имя метрики: описание и границы корзин гистограммы.
+HISTOGRAMS = {
+    'foodgram_request_duration_seconds': (
+        'Время обработки запроса', LATENCY_BUCKETS),
+    'foodgram_db_queries': (
+        'SQL-запросов на запрос, по выборке', QUERY_BUCKETS),
+    'foodgram_db_duration_seconds': (
+        'Время SQL-запросов на запрос, по выборке', LATENCY_BUCKETS),
+}
+RESPONSES = 'foodgram_responses_total'
+
+# Процесс -> время последней выгрузки метрик.
+PROCESSES_KEY = 'metrics:flushes'
+
+
+class QueryRecorder:
+    """Обертка execute_wrapper: число и время SQL-запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            self.queries.append((elapsed, sql))
+
+
+class Registry:
+    """
+    Метрики процесса. Гистограмма хранится как
+    [счетчики корзин..., больше последней границы, сумма, количество].
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.process = f'{socket.gethostname()}:{os.getpid()}'
+        self.flushed_at = 0.0
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [0] * (len(buckets) + 3)
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[index] += 1
+                break
+        else:
+            histogram[len(buckets)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def record(self, view, method, status, duration, recorder=None):
+        labels = (('view', view), ('method', method))
+        with self.lock:
+            self.observe(
+                'foodgram_request_duration_seconds', labels, duration)
+            if recorder is not None:
+                self.observe('foodgram_db_queries', labels, recorder.count)
+                self.observe(
+                    'foodgram_db_duration_seconds', labels, recorder.duration)
+            key = (RESPONSES, labels + (('status', str(status)),))
+            self.counters[key] = self.counters.get(key, 0) + 1
+        elapsed = time.monotonic() - self.flushed_at
+        if elapsed > settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return (
+                {key: list(value) for key, value in self.histograms.items()},
+                dict(self.counters),
+            )
+
+    def flush(self):
+        """
+        Копия метрик процесса уходит в общий кэш, чтобы /metrics
+        показывал сумму по всем процессам gunicorn. Процессы, которые
+        не выгружали метрики дольше срока жизни копии, убираются.
+        """
+        self.flushed_at = time.monotonic()
+        timeout = settings.METRICS_FLUSH_INTERVAL * 4
+        cache.set(f'metrics:{self.process}', self.snapshot(), timeout)
+        now = time.time()
+        processes = {
+            process: flushed
+            for process, flushed in cache.get(PROCESSES_KEY, {}).items()
+            if now - flushed < timeout
+        }
+        processes[self.process] = now
+        cache.set(PROCESSES_KEY, processes, None)
+
+
+registry = Registry()
+
+
+def merge(snapshots):
+    histograms, counters = {}, {}
+    for process_histograms, process_counters in snapshots:
+        for key, value in process_histograms.items():
+            total = histograms.setdefault(key, [0] * len(value))
+            for index, item in enumerate(value):
+                total[index] += item
+        for key, value in process_counters.items():
+            counters[key] = counters.get(key, 0) + value
+    return histograms, counters
+
+
+def format_labels(labels, *extra):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('"', '\\"'))
+        for name, value in labels + extra
+    )
+
+
+def render(histograms, counters):
+    """Текстовый формат Prometheus, корзины накопительные."""
+    lines = []
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, labels), value in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), value[:-2]):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{{format_labels(labels, ("le", bound))}}}'
+                    f' {cumulative}')
+            lines.append(f'{name}_sum{{{format_labels(labels)}}} {value[-2]}')
+            lines.append(
+                f'{name}_count{{{format_labels(labels)}}} {value[-1]}')
+    lines.append(f'# HELP {RESPONSES} Ответы по статусам')
+    lines.append(f'# TYPE {RESPONSES} counter')
+    for (_, labels), value in sorted(counters.items()):
+        lines.append(f'{RESPONSES}{{{format_labels(labels)}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    """
+    Метрики всех процессов. Эндпоинт не проксируется nginx,
+    Prometheus читает его напрямую с backend. Если задан
+    METRICS_TOKEN, нужен заголовок Authorization: Bearer <токен>.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if settings.METRICS_TOKEN and not constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''),
+        f'Bearer {settings.METRICS_TOKEN}',
+    ):
+        return HttpResponseForbidden()
+    registry.flush()
+    processes = cache.get(PROCESSES_KEY, {})
+    snapshots = cache.get_many([f'metrics:{name}' for name in processes])
+    return HttpResponse(
+        render(*merge(snapshots.values())),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+class MetricsMiddleware:
+    """
+    Время ответа считается для каждого запроса, а SQL-запросы -
+    только для доли METRICS_SAMPLE_RATE: без выборки накладные
+    расходы - два замера времени и запись в словарь.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = None
+        started = time.perf_counter()
+        if random.random() < settings.METRICS_SAMPLE_RATE:
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        registry.record(
+            view, request.method, response.status_code, duration, recorder)
+        if duration >= settings.METRICS_SLOW_REQUEST:
+            self.log_slow_request(request, view, duration, recorder)
+        return response
+
+    @staticmethod
+    def log_slow_request(request, view, duration, recorder):
+        if recorder is None:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.3f с',
+                request.method, request.path, view, duration)
+            return
+        top = '\n'.join(
+            f'  {elapsed * 1000:.1f} мс: {sql}'
+            for elapsed, sql in nlargest(
+                settings.METRICS_SLOW_QUERIES, recorder.queries)
+        )
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.3f с, SQL: %d за %.3f с\n%s',
+            request.method, request.path, view, duration,
+            recorder.count, recorder.duration, top)
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -95,6 +96,19 @@ DATABASES = {
     }
 }
 
+# Версии, ленты и журнал индекса меняют и другие процессы (worker,
+# ranking), поэтому им нужен общий кэш: в infra это memcached.
+# LocMemCache по умолчанию подходит только для одного процесса.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', default=300)),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -165,3 +179,68 @@ DJOSER = {
 }
 
 AUTH_USER_MODEL = 'users.User'
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+INGREDIENT_SEARCH_INDEX = os.getenv(
+    'INGREDIENT_SEARCH_INDEX', default='True') == 'True'
+
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', default=300))
+
+RECIPES_LIMIT = 3
+
+MAX_RECIPES_LIMIT = 50
+
+IMAGE_RENDITION_FORMAT = os.getenv('IMAGE_RENDITION_FORMAT', default='WEBP')
+
+IMAGE_RENDITION_QUALITY = int(os.getenv('IMAGE_RENDITION_QUALITY', default=80))
+
+IMAGE_THUMBNAIL_SIZE = 480
+
+IMAGE_DETAIL_SIZE = 1280
+
+JOB_QUEUE_BACKEND = os.getenv(
+    'JOB_QUEUE_BACKEND', default='food.jobs.DatabaseBackend')
+
+JOB_MAX_ATTEMPTS = 3
+
+JOB_RETRY_DELAY = 30
+
+JOB_TIMEOUT = 600
+
+POPULARITY_WINDOW = 14
+
+POPULARITY_HALF_LIFE = 3
+
+FEED_FANOUT_THRESHOLD = 100
+
+FEED_TIMELINE_SIZE = 500
+
+FEED_TIMELINE_TTL = 600
+
+SEARCH_CONFIG = 'russian'
+
+COOK_RESULTS_LIMIT = 50
+
+COVERAGE_INDEX_TTL = 3600
+
+COVERAGE_JOURNAL_SIZE = 1000
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='False') == 'True'
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', default=0))
+
+METRICS_SLOW_REQUEST = float(os.getenv('METRICS_SLOW_REQUEST', default=1))
+
+METRICS_SLOW_QUERIES = 5
+
+METRICS_FLUSH_INTERVAL = 15
+
+RECIPE_FRAGMENT_TIMEOUT = 24 * 3600
+
+BATCH_RECIPES_LIMIT = 100
@@ -14,6 +14,14 @@ class User(AbstractUser):
     last_name = models.CharField(
         'Фамилия',
         max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов',
+        default=0,
+        editable=False)
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']